@@ -1,22 +1,25 @@
 """User authentication and registration endpoints."""
 
 from datetime import datetime, timedelta, timezone
-from typing import cast
+from typing import Any, cast
+from uuid import uuid4
 
-from booklovin.core.config import APIResponse, pwd_context, DEBUG
+from booklovin.core.config import APIResponse, DEBUG
+from booklovin.core.passwords import hash_password, verify_password
 from booklovin.core.settings import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
 from booklovin.models.errors import ErrorCode, UserError, gen_error
-from booklovin.models.users import NewUser, User
-from booklovin.services import database
-from booklovin.utils.user_token import get_from_token
+from booklovin.models.users import NewUser, TokenRevocation, User
+from booklovin.services import database, errors, revocation, throttle
+from booklovin.utils.user_token import decode_claims, get_claims, get_from_token
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import jwt
+from jose import JWTError, jwt
 
 router = APIRouter(tags=["auth"])
 debug_router = APIRouter(tags=["test"])
 
 ALREADY_EXISTS = gen_error(ErrorCode.ALREADY_EXISTS, details="User already exists")
+INVALID_TOKEN = gen_error(ErrorCode.INVALID_PARAMETER, details="Invalid token")
 CREDENTIALS_EXCEPTION = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
     detail="Incorrect username or password",
@@ -39,7 +42,7 @@ async def register(request: Request, user: NewUser, response_model=None | UserEr
     existing_user = await database.users.get(db=request.app.state.db, email=user.email)
     if existing_user:
         return ALREADY_EXISTS
-    passwd = pwd_context.hash(user.password)
+    passwd = await hash_password(user.password)
     new_user = User(name=user.username, email=user.email, password=passwd)
     await database.users.create(db=request.app.state.db, user=new_user)
     return None
@@ -47,28 +50,63 @@ async def register(request: Request, user: NewUser, response_model=None | UserEr
 
 @router.post("/login", response_model=dict | UserError, response_class=APIResponse)
 async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    client_ip = throttle.client_ip(request)
+    await throttle.check_login(form_data.username, client_ip)
     user = await database.users.get(db=request.app.state.db, email=form_data.username)
 
     if not user:
+        await throttle.record_failure(form_data.username, client_ip)
         raise CREDENTIALS_EXCEPTION
 
-    verification_passed = pwd_context.verify(form_data.password, user.password)
+    verification_passed = await verify_password(form_data.password, user.password)
 
     if not verification_passed:
+        await throttle.record_failure(form_data.username, client_ip)
         raise CREDENTIALS_EXCEPTION
 
+    await throttle.record_success(form_data.username)
     return {
-        "access_token": _create_access_token(form_data.username),
+        "access_token": _create_access_token(user),
         "token_type": "bearer",
     }
 
 
-def _create_access_token(user_id: str, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
+@router.post("/logout", response_model=None | UserError, response_class=APIResponse)
+async def logout(request: Request, claims: dict[str, Any] = Depends(get_claims)) -> None | UserError:
+    """Revoke the access token used for this request."""
+    return await _revoke(request, claims)
+
+
+@router.post("/revoke", response_model=None | UserError, response_class=APIResponse)
+async def revoke(request: Request, payload: TokenRevocation, claims: dict[str, Any] = Depends(get_claims)) -> None | UserError:
+    """Revoke another access token of the current user (eg: a lost device)."""
+    try:
+        target = decode_claims(payload.token)
+    except JWTError:
+        return INVALID_TOKEN
+    if target.get("sub") != claims["sub"]:
+        return errors.FORBIDDEN
+    return await _revoke(request, target)
+
+
+async def _revoke(request: Request, claims: dict[str, Any]) -> None | UserError:
+    if "jti" not in claims:  # issued before revocation support
+        return INVALID_TOKEN
+    expires = datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+    await revocation.revoke(request.app.state.db, claims["jti"], claims.get("uid", claims["sub"]), expires)
+    return None
+
+
+def _create_access_token(user: User, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
     ref = datetime.now(timezone.utc)
     data = {
-        "sub": user_id,
+        "sub": user.email,
+        "uid": user.uid,
+        "name": user.name,
+        "role": int(user.role),
         "exp": ref + expires_delta,
         "iat": ref,
+        "jti": uuid4().hex,
     }
     return cast(str, jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM))
 
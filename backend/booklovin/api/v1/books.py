@@ -8,12 +8,15 @@ from booklovin.utils.user_token import get_from_token
 from booklovin.models.users import User
 from booklovin.models.errors import ErrorCode, UserError
 from booklovin.core.config import APIResponse
+from booklovin.core.settings import BOOKS_SEARCH_CACHE_STALE, BOOKS_SEARCH_CACHE_TTL
+from booklovin.services.response_cache import cached
 
 router = APIRouter()
 
 routers = [router]
 
 @router.get("/search", response_model=BookSearchResult, response_class=APIResponse)
+@cached("books:search", ttl=BOOKS_SEARCH_CACHE_TTL, stale=BOOKS_SEARCH_CACHE_STALE, vary=("q", "limit"))
 async def search_open_library(
     q: str = Query(..., min_length=3),
     limit: int = 10
@@ -1,9 +1,12 @@
 from booklovin.core.config import APIResponse
+from booklovin.core.settings import CONFESSIONS_CACHE_STALE, CONFESSIONS_CACHE_TTL
 from booklovin.models.confessions import Confession, NewConfession
 from booklovin.models.errors import UserError
-from booklovin.models.users import User
+from booklovin.models.users import Principal, User
 from booklovin.services import database
-from booklovin.utils.user_token import get_from_token
+from booklovin.services import response_cache
+from booklovin.services.authors import AuthorLoader, get_author_loader
+from booklovin.utils.user_token import get_from_token, get_principal
 from fastapi import APIRouter, Depends, Request
 
 router = APIRouter(tags=["confessions"])
@@ -13,20 +16,26 @@ router = APIRouter(tags=["confessions"])
 async def create_confession(request: Request, new_confession: NewConfession, user: User = Depends(get_from_token)) -> Confession:
     """Create one confession."""    
     confession = await database.confessions.create(db=request.app.state.db, confession=new_confession, user=user)
+    await response_cache.invalidate("confessions")
     return confession
 
 @router.get("/", response_model=list[Confession] | UserError, response_class=APIResponse)
-async def get_all_confessions(request: Request, user: User = Depends(get_from_token)) -> list[Confession]:
+@response_cache.cached("confessions", ttl=CONFESSIONS_CACHE_TTL, stale=CONFESSIONS_CACHE_STALE)
+async def get_all_confessions(
+    request: Request, user: Principal = Depends(get_principal), authors: AuthorLoader = Depends(get_author_loader)
+) -> list[Confession]:
     """Get all confessions."""
     result = await database.confessions.get_all(db=request.app.state.db)
-    return result or []
+    return await authors.hydrate(result or [])
 
 
 @router.get("/{confession_id}", response_model=Confession | UserError, response_class=APIResponse)
-async def get_confession(request: Request, confession_id: str, user: User = Depends(get_from_token)) -> Confession | UserError:
+async def get_confession(
+    request: Request, confession_id: str, user: Principal = Depends(get_principal), authors: AuthorLoader = Depends(get_author_loader)
+) -> Confession | UserError:
     """Get one specific confession."""
     result = await database.confessions.get(db=request.app.state.db, confession_id=confession_id)
-    return result
+    return result if isinstance(result, UserError) else await authors.hydrate_one(result)
 
 
 routers = [router]
@@ -0,0 +1,22 @@
+"""Runtime counters for caches, executors and throttles."""
+
+from booklovin.core import metrics
+from booklovin.core.config import APIResponse
+from booklovin.models.errors import UserError
+from booklovin.models.users import User, UserRole
+from booklovin.services import errors
+from booklovin.utils.user_token import get_from_token
+from fastapi import APIRouter, Depends
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/", response_model=dict | UserError, response_class=APIResponse)
+async def read_metrics(user: User = Depends(get_from_token)) -> dict | UserError:
+    """Return a snapshot of every registered metrics provider, to editors only."""
+    if user.role < UserRole.EDITOR:
+        return errors.FORBIDDEN
+    return metrics.snapshot()
+
+
+routers = [router]
@@ -1,25 +1,42 @@
 """Routes for /posts."""
 
+import asyncio
 import json
-from typing import List
+import time
+from typing import AsyncIterator, List
 from fastapi import (
     APIRouter,
     Depends,
+    Query,
     Request,
+    Response,
     HTTPException,
     status,
     Form,
     File,
     UploadFile,
 )
-
-from booklovin.core.config import APIResponse
-from booklovin.models.comments import Comment, NewComment
+from fastapi.responses import StreamingResponse
+
+from booklovin.core.config import DEBUG, APIResponse, oauth2_scheme
+from booklovin.core.settings import (
+    EVENTS_KEEPALIVE,
+    EVENTS_MAX_WATCHED,
+    EVENTS_RETRY,
+    POPULAR_CACHE_STALE,
+    POPULAR_CACHE_TTL,
+    SEARCH_MAX_QUERY_LENGTH,
+    SEARCH_MAX_RESULTS,
+)
+from booklovin.core.utils import decode_cursor, dumps, encode_cursor
+from booklovin.models.comments import Comment, CommentPage, NewComment
 from booklovin.models.errors import UserError
-from booklovin.models.post import NewPost, Post
-from booklovin.models.users import User
-from booklovin.services import database, errors
-from booklovin.utils.user_token import get_from_token
+from booklovin.models.post import LikeState, NewPost, Post, PostKey, PostPage, PostSummary, PostView
+from booklovin.models.users import Author, Principal, User
+from booklovin.services import database, errors, events, versions
+from booklovin.services.authors import AuthorLoader, get_author_loader
+from booklovin.services.response_cache import cached
+from booklovin.utils.user_token import EVENTS_COOKIE, get_claims, get_from_token, get_principal, get_stream_principal
 from booklovin.models.reactions import ReactionRequest
 from booklovin.core.storage import save_uploaded_images
 
@@ -27,6 +44,25 @@ router = APIRouter(tags=["posts"])
 
 crouter = APIRouter(tags=["comments"])
 
+PAGE_MAX_LIMIT = 40
+
+
+async def _changed(post_id: str, result: object = None) -> None:
+    """Bump the versions (ETags) of a post and of the lists, unless the write failed."""
+    if not isinstance(result, UserError):
+        await versions.bump("posts", f"post:{post_id}")
+
+
+def _decode_after(cursor: str | None) -> PostKey | None:
+    """Returns the (creationTime, uid) position of a page cursor, raises ValueError if invalid."""
+    if not cursor:
+        return None
+    try:
+        creation_time, uid = decode_cursor(cursor)
+        return (float(creation_time), str(uid))
+    except TypeError as e:
+        raise ValueError(cursor) from e
+
 
 @router.post("/", response_model=Post | UserError, response_class=APIResponse)
 async def create_post(
@@ -58,79 +94,246 @@ async def create_post(
 
         new_post = Post.from_new_model(post_data, user.uid)
         await database.post.create(db=request.app.state.db, post=new_post)
+        await versions.bump("posts")
+        await events.publish("post", uid=new_post.uid, authorId=user.uid, title=new_post.title)
         return new_post
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@router.get("/", response_model=list[Post] | UserError, response_class=APIResponse)
-async def read_all_posts(request: Request, s: int, e: int, user: User = Depends(get_from_token)) -> list[Post] | UserError:
-    """Get a range of posts (from most recent to oldest)."""
+@router.get("/", response_model=list[Post] | list[PostSummary] | UserError, response_class=APIResponse)
+async def read_all_posts(
+    request: Request,
+    response: Response,
+    s: int,
+    e: int,
+    view: PostView = "full",
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> list[Post] | list[PostSummary] | UserError | Response:
+    """Get a range of posts (from most recent to oldest), `view=summary` returns them as PostSummary.
+
+    Kept for compatibility, prefer the cursor based `/page` which doesn't slow down on deep pages.
+    """
     if e <= s:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="End must be greater than start")
     if e - s > 40:
         return errors.ABUSIVE_USAGE
-    return await database.post.get_all(db=request.app.state.db, start=s, end=e)
+    if not_modified := await versions.not_modified(request, response, "posts", variant=f"{s}:{e}:{view}"):
+        return not_modified
+    return await authors.hydrate(await database.post.get_all(db=request.app.state.db, start=s, end=e, view=view))
 
 
-@router.get("/recent", response_model=list[Post] | UserError, response_class=APIResponse)
-async def read_recent_posts(request: Request, user: User = Depends(get_from_token)) -> list[Post] | UserError:
+@router.get("/page", response_model=PostPage | UserError, response_class=APIResponse)
+async def read_posts_page(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = 20,
+    view: PostView = "full",
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> PostPage | UserError | Response:
+    """Get one page of posts (from most recent to oldest), `next` is the cursor of the following page."""
+    if not 0 < limit <= PAGE_MAX_LIMIT:
+        return errors.ABUSIVE_USAGE
+    try:
+        after = _decode_after(cursor)
+    except ValueError:
+        return errors.INVALID_CURSOR
+    if not_modified := await versions.not_modified(request, response, "posts", variant=f"{cursor}:{limit}:{view}"):
+        return not_modified
+    posts = await authors.hydrate(await database.post.get_page(db=request.app.state.db, after=after, limit=limit + 1, view=view))
+    if len(posts) <= limit:
+        return PostPage(posts=posts)
+    last = posts[limit - 1]
+    return PostPage(posts=posts[:limit], next=encode_cursor(last.creationTime.timestamp(), last.uid))
+
+
+@router.get("/recent", response_model=list[Post] | list[PostSummary] | UserError, response_class=APIResponse)
+async def read_recent_posts(
+    request: Request,
+    response: Response,
+    view: PostView = "full",
+    user: User = Depends(get_from_token),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> list[Post] | list[PostSummary] | UserError | Response:
     """Return a list of recent subscribed posts."""
-    return await database.post.get_recent(db=request.app.state.db, user=user)
+    if not_modified := await versions.not_modified(request, response, "posts", f"following:{user.uid}", variant=f"{user.uid}:{view}"):
+        return not_modified
+    posts = await database.post.get_recent(db=request.app.state.db, user=user, view=view)
+    return posts if isinstance(posts, UserError) else await authors.hydrate(posts)
 
 
-@router.get("/popular", response_model=list[Post] | UserError, response_class=APIResponse)
-async def read_popular_posts(request: Request, user: User = Depends(get_from_token)) -> list[Post] | UserError:
+@router.get("/popular", response_model=list[Post] | list[PostSummary] | UserError, response_class=APIResponse)
+async def read_popular_posts(
+    request: Request,
+    response: Response,
+    view: PostView = "full",
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> list[Post] | list[PostSummary] | UserError | Response:
     """Return a list of recent popular posts."""
-    return await database.post.get_popular(db=request.app.state.db)
+    if not_modified := await versions.not_modified(request, response, "posts", "popular", variant=view):
+        return not_modified
+    return await _popular_posts(request, authors, view)
+
+
+# same for everyone: shared, and bumps the "popular" ETag version when it changes
+@cached("posts:popular", ttl=POPULAR_CACHE_TTL, stale=POPULAR_CACHE_STALE, vary=("view",), version="popular")
+async def _popular_posts(request: Request, authors: AuthorLoader, view: PostView) -> list[Post] | list[PostSummary] | UserError:
+    posts = await database.post.get_popular(db=request.app.state.db, view=view)
+    return posts if isinstance(posts, UserError) else await authors.hydrate(posts)
+
+
+@router.get("/search", response_model=PostPage | UserError, response_class=APIResponse)
+async def search_posts(
+    request: Request,
+    q: str,
+    cursor: str | None = None,
+    limit: int = 20,
+    view: PostView = "full",
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> PostPage | UserError:
+    """Search the posts titles and contents, best matches first; `next` is the cursor of the following page."""
+    if not 0 < limit <= PAGE_MAX_LIMIT or len(q) > SEARCH_MAX_QUERY_LENGTH:
+        return errors.ABUSIVE_USAGE
+    try:
+        offset = int(decode_cursor(cursor)[0]) if cursor else 0
+    except (ValueError, TypeError, IndexError):
+        return errors.INVALID_CURSOR
+    if offset < 0:
+        return errors.INVALID_CURSOR
+    limit = min(limit, SEARCH_MAX_RESULTS - offset)
+    if not q.strip() or limit <= 0:
+        return PostPage(posts=[])
+    found = await database.post.search(db=request.app.state.db, query=q, offset=offset, limit=limit + 1, view=view)
+    posts = await authors.hydrate(found[:limit])
+    return PostPage(posts=posts, next=encode_cursor(offset + limit) if len(found) > limit else None)
+
+
+async def _event_stream(request: Request, following: set[str], watched: set[str]) -> AsyncIterator[str]:
+    async with events.subscribe() as queue:
+        yield f"retry: {EVENTS_RETRY}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return  # dropped for falling behind, the client reconnects
+            if event["type"] == "post":
+                if event["authorId"] not in following:
+                    continue
+                if len(watched) < EVENTS_MAX_WATCHED:
+                    watched.add(event["uid"])  # the client shows it from now on
+            elif event["uid"] not in watched:
+                continue
+            yield f"event: {event['type']}\ndata: {dumps(event)}\n\n"
+
+
+@router.post("/events/session", response_model=None, response_class=APIResponse)
+async def open_events_session(
+    request: Request, response: Response, token: str = Depends(oauth2_scheme), claims: dict = Depends(get_claims)
+) -> None:
+    """Hands the access token over to /events as a cookie, which EventSource sends along.
+
+    The cookie is HttpOnly, limited to the events path and expires with the token.
+    """
+    response.set_cookie(
+        EVENTS_COOKIE,
+        token,
+        max_age=max(int(claims.get("exp", 0) - time.time()), 0),
+        path=request.url.path.removesuffix("/session"),
+        httponly=True,
+        secure=not DEBUG,
+        samesite="strict",
+    )
+    return None
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def stream_events(
+    request: Request, watch: str = Query("", max_length=8_000), user: Principal = Depends(get_stream_principal)
+) -> StreamingResponse:
+    """Server-sent events replacing the polling of the feed and of the counters.
+
+    Authenticated by the usual header or, for EventSource clients, the cookie set by
+    /events/session.
+
+    `post` announces a new post of the user or of a followed author (as followed when
+    connecting). `likes` and `reactions` carry the new counters of a post, only for the
+    posts the client shows: the comma separated uids of `watch`, plus the announced posts.
+    """
+    following = {*await database.users.get_following(request.app.state.db, user.uid), user.uid}
+    watched = {uid for uid in watch.split(",")[:EVENTS_MAX_WATCHED] if uid}
+    return StreamingResponse(
+        _event_stream(request, following, watched),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # get one
 @router.get("/{post_id}", response_model=Post | UserError, response_class=APIResponse)
-async def read_one_post(request: Request, post_id: str, user: User = Depends(get_from_token)) -> Post | UserError:
+async def read_one_post(
+    request: Request,
+    response: Response,
+    post_id: str,
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> Post | UserError | Response:
     """Get one specific post."""
+    if not_modified := await versions.not_modified(request, response, f"post:{post_id}"):
+        return not_modified
     post = await database.post.get_one(db=request.app.state.db, post_id=post_id)
-    return post or errors.POST_NOT_FOUND
+    return await authors.hydrate_one(post) if post else errors.POST_NOT_FOUND
 
 
 # update
 @router.put("/{post_id}", response_model=None | UserError, response_class=APIResponse)
-async def update_post(request: Request, post_id: str, post: Post, user: User = Depends(get_from_token)) -> None | UserError:
-    """Update a specific post."""
-    existing_post = await database.post.get_one(db=request.app.state.db, post_id=post_id)
-    if not existing_post:
-        return errors.POST_NOT_FOUND
-    if existing_post.authorId != user.uid:
-        return errors.FORBIDDEN
-    await database.post.update(db=request.app.state.db, post_id=post_id, post_data=post)
-
-
-@router.put("/{post_id}/react", response_model=dict, response_class=APIResponse)
-async def react_to_post(request: Request, post_id: str, payload: ReactionRequest, user: User = Depends(get_from_token)):
-    """React to a specific post."""
-    db = request.app.state.db
-    await database.post.react(db=db, post_id=post_id, user_id=user.uid, reaction_type=payload.reaction)
-
-    updated_post = await database.post.get_one(db=db, post_id=post_id)
-    if not updated_post:
-        raise HTTPException(status_code=404, detail="Post not found after reaction.")
-
-    return updated_post.reactions
+async def update_post(request: Request, post_id: str, post: Post, user: Principal = Depends(get_principal)) -> None | UserError:
+    """Update a specific post, allowed to its author only."""
+    result = await database.post.update(db=request.app.state.db, post_id=post_id, post_data=post, author_id=user.uid)
+    await _changed(post_id, result)
+    return result
+
+
+@router.put("/{post_id}/like", response_model=LikeState | UserError, response_class=APIResponse)
+async def like_post(request: Request, post_id: str, user: Principal = Depends(get_principal)) -> LikeState | UserError:
+    """Like (or unlike) a specific post, returns the new like state so clients don't need to reload the post."""
+    result = await database.post.like(db=request.app.state.db, post_id=post_id, user_id=user.uid)
+    await _changed(post_id, result)
+    if isinstance(result, LikeState):
+        await events.publish("likes", uid=post_id, likes=result.likes)
+    return result
+
+
+@router.put("/{post_id}/react", response_model=dict[str, int] | UserError, response_class=APIResponse)
+async def react_to_post(
+    request: Request, post_id: str, payload: ReactionRequest, user: Principal = Depends(get_principal)
+) -> dict[str, int] | UserError:
+    """React to a specific post (the same reaction again removes it), returns the reaction counters."""
+    result = await database.post.react(db=request.app.state.db, post_id=post_id, user_id=user.uid, reaction_type=payload.reaction)
+    await _changed(post_id, result)
+    if not isinstance(result, UserError):
+        await events.publish("reactions", uid=post_id, reactions=result)
+    return result
 
 
 @router.delete("/{post_id}", response_model=None | UserError, response_class=APIResponse)
-async def delete_post(request: Request, post_id: str, user: User = Depends(get_from_token)) -> None | UserError:
-    """Delete a specific post."""
-    existing_post = await database.post.get_one(db=request.app.state.db, post_id=post_id)
-    if not existing_post:
-        return errors.POST_NOT_FOUND
-    if existing_post.authorId != user.uid:
-        return errors.FORBIDDEN
-    return await database.post.delete(
-        db=request.app.state.db,
-        post_id=post_id,
-    )
+async def delete_post(request: Request, post_id: str, user: Principal = Depends(get_principal)) -> None | UserError:
+    """Delete a specific post, allowed to its author only."""
+    result = await database.post.delete(db=request.app.state.db, post_id=post_id, author_id=user.uid)
+    await _changed(post_id, result)
+    return result
 
 
 @crouter.post("/{post_id}/comments", response_model=Comment, summary="Add a comment to a post", response_class=APIResponse)
@@ -147,22 +350,53 @@ async def add_comment_to_post(
     new_comment = Comment.from_new_model(comment, user.uid)
 
     await database.post.add_comment(db=db, comment=new_comment)
+    await _changed(comment.postId)
 
-    author_details = {"penName": user.name}
-    comment_response_dict = new_comment.model_dump()
-    comment_response_dict["author"] = author_details
-
-    return Comment.from_dict(comment_response_dict)
+    return new_comment.model_copy(update={"author": Author(uid=user.uid, penName=user.name)})
 
 
 @crouter.get(
     "/{post_id}/comments", response_model=list[Comment] | UserError, summary="Get all comments for a post", response_class=APIResponse
 )
-async def get_comments_for_post(request: Request, post_id: str, user: User = Depends(get_from_token)) -> list[Comment] | UserError:
-    """Retrieve all comments for a specific post."""
+async def get_comments_for_post(
+    request: Request, post_id: str, user: Principal = Depends(get_principal), authors: AuthorLoader = Depends(get_author_loader)
+) -> list[Comment] | UserError:
+    """Retrieve all comments for a specific post.
+
+    Kept for compatibility, prefer the cursor based `/comments/page` on busy posts.
+    """
     if not await database.post.exists(db=request.app.state.db, post_id=post_id):
         return errors.POST_NOT_FOUND
-    return await database.post.get_comments(db=request.app.state.db, post_id=post_id) or []
+    comments = await database.post.get_comments(db=request.app.state.db, post_id=post_id)
+    return comments if isinstance(comments, UserError) else await authors.hydrate(comments or [])
+
+
+@crouter.get(
+    "/{post_id}/comments/page", response_model=CommentPage | UserError, summary="Get one page of comments", response_class=APIResponse
+)
+async def get_comments_page(
+    request: Request,
+    post_id: str,
+    cursor: str | None = None,
+    limit: int = 20,
+    user: Principal = Depends(get_principal),
+    authors: AuthorLoader = Depends(get_author_loader),
+) -> CommentPage | UserError:
+    """Get one page of comments of a post (from most recent to oldest), `next` is the cursor of the following page."""
+    if not 0 < limit <= PAGE_MAX_LIMIT:
+        return errors.ABUSIVE_USAGE
+    try:
+        after = _decode_after(cursor)
+    except ValueError:
+        return errors.INVALID_CURSOR
+    db = request.app.state.db
+    if not await database.post.exists(db=db, post_id=post_id):
+        return errors.POST_NOT_FOUND
+    comments = await authors.hydrate(await database.post.get_comments_page(db=db, post_id=post_id, after=after, limit=limit + 1))
+    if len(comments) <= limit:
+        return CommentPage(comments=comments)
+    last = comments[limit - 1]
+    return CommentPage(comments=comments[:limit], next=encode_cursor(last.creationTime.timestamp(), last.uid))
 
 
 @crouter.delete(
@@ -172,29 +406,25 @@ async def get_comments_for_post(request: Request, post_id: str, user: User = Dep
     response_class=APIResponse,
 )
 async def delete_a_comments_for_post(
-    request: Request, post_id: str, comment_id: str, user: User = Depends(get_from_token)
+    request: Request, post_id: str, comment_id: str, user: Principal = Depends(get_principal)
 ) -> None | UserError:
-    """Delete one comment."""
-    post_to_modify = await database.post.get_one(db=request.app.state.db, post_id=post_id)
-    if not post_to_modify:
-        return errors.POST_NOT_FOUND
-
-    comments_result = await database.post.get_comments(db=request.app.state.db, post_id=post_id)
-    if isinstance(comments_result, UserError) or not comments_result:
-        return errors.NOT_FOUND
-
-    comment_to_delete = next((c for c in comments_result if c.uid == comment_id), None)
-
+    """Delete one comment, allowed to the comment author and to the post author."""
+    db = request.app.state.db
+    comment_to_delete = await database.post.get_comment(db=db, post_id=post_id, comment_id=comment_id)
     if not comment_to_delete:
         return errors.NOT_FOUND
 
-    if comment_to_delete.authorId != user.uid and post_to_modify.authorId != user.uid:
-        return errors.FORBIDDEN
-
-    result = await database.post.delete_comment(db=request.app.state.db, post_id=post_id, comment_id=comment_id)
-    if isinstance(result, UserError):
-        return result
-    return None
+    if comment_to_delete.authorId != user.uid:
+        # only then is the post needed, to check its author
+        post_to_modify = await database.post.get_one(db=db, post_id=post_id)
+        if not post_to_modify:
+            return errors.POST_NOT_FOUND
+        if post_to_modify.authorId != user.uid:
+            return errors.FORBIDDEN
+
+    result = await database.post.delete_comment(db=db, post_id=post_id, comment_id=comment_id)
+    await _changed(post_id, result)
+    return result
 
 
 routers = [router, crouter]
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, Request, HTTPException, status
 from booklovin.core.config import APIResponse
 from booklovin.models.profile import UpdateGoalRequest, UserProfile, UpdateQuoteRequest, UpdateGenresRequest, UpdateArchetypeRequest
 from booklovin.models.errors import UserError
+from booklovin.models.post import PostView
 from booklovin.models.users import User
-from booklovin.services import database
+from booklovin.services import database, versions
 from booklovin.utils.user_token import get_from_token
 from typing import List
 
@@ -14,17 +15,50 @@ routers = [router]
 async def get_user_profile(
     request: Request,
     name: str,
+    view: PostView = "full",
     user: User = Depends(get_from_token)
 ) -> UserProfile | UserError:
-    """Get a user's public profile data by name."""
+    """Get a user's public profile data by name, `view=summary` lists the posts as PostSummary."""
     db = request.app.state.db
-    result = await database.profile.get_profile_by_name(db, name)
+    result = await database.profile.get_profile_by_name(db, name, view)
     
     if isinstance(result, UserError):
         raise HTTPException(status_code=404, detail=result.message)
     
     return result
 
+@router.get("/me/following", response_model=List[str], response_class=APIResponse)
+async def get_following(
+    request: Request,
+    user: User = Depends(get_from_token)
+) -> List[str]:
+    """List the uids of the users followed by the authenticated user."""
+    return await database.users.get_following(request.app.state.db, user.uid)
+
+@router.put("/me/following/{user_id}", response_model=None | UserError, response_class=APIResponse)
+async def follow_user(
+    request: Request,
+    user_id: str,
+    user: User = Depends(get_from_token)
+) -> None | UserError:
+    """Follow a user, their new posts show up in the home timeline."""
+    result = await database.users.follow(request.app.state.db, user.uid, user_id)
+    if not isinstance(result, UserError):
+        await versions.bump(f"following:{user.uid}")
+    return result
+
+@router.delete("/me/following/{user_id}", response_model=None | UserError, response_class=APIResponse)
+async def unfollow_user(
+    request: Request,
+    user_id: str,
+    user: User = Depends(get_from_token)
+) -> None | UserError:
+    """Stop following a user."""
+    result = await database.users.unfollow(request.app.state.db, user.uid, user_id)
+    if not isinstance(result, UserError):
+        await versions.bump(f"following:{user.uid}")
+    return result
+
 @router.put("/me/quote", response_model=User, response_class=APIResponse)
 async def set_favorite_quote(
     request: Request,
@@ -0,0 +1,27 @@
+"""Fixed size bloom filter."""
+
+import hashlib
+from typing import Iterator
+
+
+class BloomFilter:
+    """Probabilistic set of strings: no false negatives, rare false positives."""
+
+    def __init__(self, size_bits: int, hashes: int):
+        self.size = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # double hashing: h1 + i * h2 derives all the positions from one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
@@ -19,9 +19,28 @@ logger.info(f"Database: {DB_TYPE.upper()}::{DB_NAME}")
 MONGO_SERVER = (os.environ.get("MONGO_HOST", "localhost"), int(os.environ.get("MONGO_PORT", "27017")))
 # REDIS
 REDIS_SERVER = (os.environ.get("REDIS_HOST", "localhost"), int(os.environ.get("REDIS_PORT", "6379")))
+# login throttling counters: "memory" (per worker) or "redis" (shared)
+LOGIN_THROTTLE_BACKEND = os.environ.get("LOGIN_THROTTLE_BACKEND", "memory")
+# header holding the client address behind a reverse proxy (eg: X-Forwarded-For), else every
+# client shares the proxy's IP throttling. Only set it when a proxy always sets this header.
+LOGIN_CLIENT_IP_HEADER = os.environ.get("LOGIN_CLIENT_IP_HEADER", "")
+# ETag version counters: "memory" (per worker) or "redis" (shared). With several workers on
+# "memory", a write only bumps the counters of the worker handling it: the other workers
+# keep answering 304 for the changed data until their VERSIONS_MEMORY_WINDOW rolls over.
+# Use "redis" whenever more than one worker serves the API.
+VERSIONS_BACKEND = os.environ.get("VERSIONS_BACKEND", "memory")
+# shared responses are cached per worker, and also in redis when enabled
+RESPONSE_CACHE_REDIS = os.environ.get("RESPONSE_CACHE_REDIS", "").lower() in ("1", "true", "yes")
+# live events: "memory" (streams only see the writes of their worker) or "redis" (pub/sub, shared)
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "memory")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
+# for the routes that also take the token elsewhere than the Authorization header
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login", auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs in a dedicated pool, requests beyond workers + queue get a 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "32"))
 
 
 # Test data
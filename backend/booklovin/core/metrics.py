@@ -0,0 +1,14 @@
+"""Process-local metrics, exposed on /api/v1/metrics."""
+
+from typing import Any, Callable
+
+_providers: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register(name: str, provider: Callable[[], dict[str, Any]]) -> None:
+    """Register a callable returning a snapshot of some component's counters."""
+    _providers[name] = provider
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    return {name: provider() for name, provider in _providers.items()}
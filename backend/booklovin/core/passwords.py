@@ -0,0 +1,80 @@
+"""Password hashing off the event loop.
+
+bcrypt is deliberately slow, running it inside a handler blocks every other
+request. Calls go through a small dedicated thread pool (bcrypt releases the GIL)
+and are shed with a 503 once too many are waiting.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from booklovin.core import metrics
+from booklovin.core.config import PASSWORD_HASH_QUEUE, PASSWORD_HASH_WORKERS, pwd_context
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwd-hash")
+_max_inflight = PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE
+
+_stats = {
+    "inflight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "total_ms": 0.0,
+    "max_ms": 0.0,
+}
+
+SERVER_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server busy, please retry",
+    headers={"Retry-After": "1"},
+)
+
+
+def _release(start: float) -> None:
+    elapsed = (time.perf_counter() - start) * 1000
+    _stats["inflight"] -= 1
+    _stats["completed"] += 1
+    _stats["total_ms"] += elapsed
+    _stats["max_ms"] = max(_stats["max_ms"], elapsed)
+
+
+async def _run(func: Callable[..., T], *args: Any) -> T:
+    if _stats["inflight"] >= _max_inflight:
+        _stats["rejected"] += 1
+        logger.warning("Password hashing saturated, rejecting request")
+        raise SERVER_BUSY
+    _stats["inflight"] += 1
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    future = _executor.submit(func, *args)
+    # released once the thread is done, a cancelled request doesn't stop the hashing
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release, start))
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _run(pwd_context.verify, password, hashed)
+
+
+def _metrics() -> dict[str, Any]:
+    completed = _stats["completed"]
+    return {
+        **_stats,
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE,
+        "avg_ms": round(_stats["total_ms"] / completed, 2) if completed else 0.0,
+    }
+
+
+metrics.register("password_hashing", _metrics)
@@ -16,3 +16,66 @@ if not _secret_key:
 SECRET_KEY = _secret_key
 ACCESS_TOKEN_EXPIRE_MINUTES = 7 * 24 * 60  # 7 days
 ALGORITHM = "HS256"
+
+# USER CACHE
+USER_CACHE_SIZE = 10_000
+USER_CACHE_TTL = 60  # seconds
+
+# VERIFIED TOKEN CACHE
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL = 15 * 60  # seconds, entries never outlive the token itself
+
+# TOKEN REVOCATION
+REVOCATION_BLOOM_BITS = 1 << 20  # 128 KiB, ~1% false positives at 100k revoked tokens
+REVOCATION_BLOOM_HASHES = 7
+REVOCATION_REFRESH_INTERVAL = 60  # seconds
+
+# LOGIN THROTTLING
+LOGIN_THROTTLE_WINDOW = 15 * 60  # seconds
+LOGIN_MAX_ATTEMPTS_PER_ACCOUNT = 10
+LOGIN_MAX_ATTEMPTS_PER_IP = 50
+LOGIN_THROTTLE_MAX_KEYS = 100_000  # memory backend only
+
+# BACKGROUND JOBS
+COUNTERS_RECONCILE_INTERVAL = 6 * 60 * 60  # seconds, likes and comments counters
+
+# POPULAR POSTS
+POPULAR_WINDOW_HOURS = int(os.getenv("POPULAR_WINDOW_HOURS", "24"))
+POPULAR_POSTS_LIMIT = int(os.getenv("POPULAR_POSTS_LIMIT", str(RECENT_POSTS_LIMIT)))
+POPULAR_ROLL_INTERVAL = 5 * 60  # seconds
+
+# HOME TIMELINES
+TIMELINE_LENGTH = 500  # posts kept in each materialized timeline
+FANOUT_MAX_FOLLOWERS = 10_000  # above this, followers pull the author's posts when reading
+
+# DELETED POSTS CLEANUP
+CLEANUP_INTERVAL = 60  # seconds
+CLEANUP_BATCH_SIZE = 1000  # documents removed per delete_many
+CLEANUP_LEASE = 10 * 60  # seconds a worker owns a cleanup before another one may resume it
+CLEANUP_ORPHANS_INTERVAL = 6 * 60 * 60  # seconds between the scans for posts deleted without a cleanup
+
+# ETAGS
+VERSIONS_MAX_KEYS = 100_000  # memory backend only
+# memory backend only: ETags change every window, bounding how long the writes handled
+# by other workers go unseen (0 for a single worker deployment, ETags then never expire)
+VERSIONS_MEMORY_WINDOW = int(os.getenv("VERSIONS_MEMORY_WINDOW", "30"))  # seconds
+
+# SHARED RESPONSES CACHE (seconds fresh, then seconds served stale while recomputing)
+RESPONSE_CACHE_SIZE = 1_000
+POPULAR_CACHE_TTL, POPULAR_CACHE_STALE = 30, 5 * 60
+CONFESSIONS_CACHE_TTL, CONFESSIONS_CACHE_STALE = 15, 60
+BOOKS_SEARCH_CACHE_TTL, BOOKS_SEARCH_CACHE_STALE = 60 * 60, 24 * 60 * 60
+
+# POSTS SEARCH
+SEARCH_MAX_RESULTS = 200  # deepest result reachable through the pages
+SEARCH_MAX_QUERY_LENGTH = 200
+SEARCH_TITLE_WEIGHT = 3  # a term in the title counts as much as 3 in the content
+
+# IMAGE UPLOADS
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))  # images of a post saved in parallel
+
+# LIVE EVENTS
+EVENTS_QUEUE_SIZE = 256  # events buffered per stream before a slow client is dropped
+EVENTS_KEEPALIVE = 20  # seconds between comments on an idle stream, keeps proxies from closing it
+EVENTS_RETRY = 5_000  # milliseconds a client waits before reconnecting
+EVENTS_MAX_WATCHED = 200  # posts a stream receives the counters of
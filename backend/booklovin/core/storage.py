@@ -1,56 +1,153 @@
 import aiofiles
+import aiofiles.os
+import asyncio
+import contextlib
 import logging
+import time
 import uuid
 import os
-from typing import List
+from dataclasses import dataclass
+from typing import Any, List
 from fastapi import UploadFile, HTTPException, status
 
+from booklovin.core import metrics
+from booklovin.core.settings import UPLOAD_CONCURRENCY
+
 logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = "static/images/posts"
+UPLOAD_URL = "/static/images/posts/"
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes held in memory per upload
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 
+_stats = {"saved": 0, "failed": 0, "seconds": 0.0}
 
-async def save_uploaded_images(files: List[UploadFile]) -> List[str]:
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)} MB",
+    )
+
+
+async def _stream_to_disk(file: UploadFile, ext: str) -> str:
     """
-    Saves a list of uploaded files to the UPLOAD_DIR
-    and returns a list of their web-accessible URLs.
+    Copies an upload to UPLOAD_DIR chunk by chunk and returns its file name,
+    aborting (413) as soon as MAX_FILE_SIZE is crossed.
+    The data goes to a temporary file renamed once complete, so a partial image is never served.
     """
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise _too_large()
+    filename = f"{uuid.uuid4()}.{ext}"
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    temp_path = f"{file_path}.part"
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise _too_large()
+                await f.write(chunk)
+        await aiofiles.os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            await aiofiles.os.remove(temp_path)
+        raise
+    return filename
 
-    image_urls = []
-    for file in files:
-        # Validate content type
-        if file.content_type not in ALLOWED_CONTENT_TYPES:
-            continue
 
-        # Validate extension
-        if not file.filename or "." not in file.filename:
-            continue
-        ext = file.filename.rsplit(".", 1)[-1].lower()
-        if ext not in ALLOWED_EXTENSIONS:
-            continue
+@dataclass
+class _Upload:
+    filename: str | None  # as sent by the client
+    url: str | None = None
+    error: str | None = None
+    status_code: int = status.HTTP_200_OK
+    seconds: float = 0.0
 
-        # Read file content and check size
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)} MB",
-            )
 
-        filename = f"{uuid.uuid4()}.{ext}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+def _extension(file: UploadFile) -> str:
+    """Returns the extension of an acceptable image, raises ValueError with the reason otherwise."""
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type {file.content_type}")
+    if not file.filename or "." not in file.filename:
+        raise ValueError("Missing file extension")
+    ext = file.filename.rsplit(".", 1)[-1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Unsupported file extension {ext}")
+    return ext
 
+
+async def _save(file: UploadFile, slots: asyncio.Semaphore) -> _Upload:
+    upload = _Upload(file.filename)
+    async with slots:
+        start = time.perf_counter()
         try:
-            async with aiofiles.open(file_path, "wb") as f:
-                await f.write(content)
+            upload.url = f"{UPLOAD_URL}{await _stream_to_disk(file, _extension(file))}"
+        except HTTPException as e:
+            upload.error, upload.status_code = e.detail, e.status_code
+        except ValueError as e:
+            upload.error, upload.status_code = str(e), status.HTTP_400_BAD_REQUEST
         except IOError as e:
             logger.error(f"Error saving file: {e}")
+            upload.error, upload.status_code = "Could not save the file", status.HTTP_500_INTERNAL_SERVER_ERROR
+        upload.seconds = time.perf_counter() - start
+    _stats["saved" if upload.url else "failed"] += 1
+    _stats["seconds"] += upload.seconds
+    logger.info(f"Upload {upload.filename!r}: {upload.error or upload.url} in {upload.seconds * 1000:.1f} ms")
+    return upload
+
+
+def _unexpected(file: UploadFile, error: BaseException) -> _Upload:
+    logger.error(f"Unexpected error saving file {file.filename!r}: {error!r}")
+    _stats["failed"] += 1
+    return _Upload(file.filename, error="Could not save the file", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def save_uploaded_images(files: List[UploadFile]) -> List[str]:
+    """
+    Saves a list of uploaded files to the UPLOAD_DIR (UPLOAD_CONCURRENCY at a time)
+    and returns a list of their web-accessible URLs, in the order of `files`.
+    If any file is rejected or fails, none is kept and the error lists each failed file.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    # an unexpected error fails its file only: the saved ones still go through the cleanup below
+    results = await asyncio.gather(*(_save(file, slots) for file in files), return_exceptions=True)
+    uploads = [_unexpected(file, result) if isinstance(result, BaseException) else result for file, result in zip(files, results)]
+
+    failed = [u for u in uploads if u.error]
+    if failed:
+        await delete_uploaded_images([u.url for u in uploads if u.url])
+        raise HTTPException(
+            status_code=max(u.status_code for u in failed),
+            detail=[{"filename": u.filename, "error": u.error} for u in failed],
+        )
+    return [u.url for u in uploads if u.url]
+
+
+async def delete_uploaded_images(image_urls: List[str]) -> int:
+    """
+    Removes the files of uploaded images (other URLs are ignored),
+    returns the number of deleted files. Missing files are not an error.
+    """
+    deleted = 0
+    for url in image_urls:
+        if not url.startswith(UPLOAD_URL):
             continue
+        try:
+            await aiofiles.os.remove(os.path.join(UPLOAD_DIR, os.path.basename(url)))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+def _metrics() -> dict[str, Any]:
+    return {**_stats, "concurrency": UPLOAD_CONCURRENCY}
 
-        image_urls.append(f"/static/images/posts/{filename}")
 
-    return image_urls
+metrics.register("uploads", _metrics)
@@ -1,3 +1,5 @@
+import base64
+import binascii
 import typing
 from datetime import datetime
 from typing import Any
@@ -17,6 +19,22 @@ def loads(data: str | bytes) -> Any:
     return orjson_loads(data)
 
 
+def encode_cursor(*values: Any) -> str:
+    """Return an opaque (url safe) pagination cursor holding `values`."""
+    return base64.urlsafe_b64encode(orjson_dumps(values)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    """Decode a cursor built by `encode_cursor`, raises ValueError if it's invalid."""
+    try:
+        values = orjson_loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
 def isError(data) -> bool:
     return bool(getattr(data, "error", False))
 
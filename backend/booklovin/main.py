@@ -4,20 +4,27 @@ import importlib
 from contextlib import asynccontextmanager
 
 from booklovin.core import config
-from booklovin.services import database
+from booklovin.services import database, events, jobs, revocation, user_cache
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from fastapi.staticfiles import StaticFiles
 
-providers = ("auth", "posts", "journal", "letters", "confessions", "books", "profile")
+providers = ("auth", "posts", "journal", "letters", "confessions", "books", "profile", "metrics")
 database_config = database.init(config.DB_TYPE)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database_config.setup(app)
+    user_cache.clear()
+    await revocation.load(app.state.db)
+    await jobs.catch_up(app.state.db)
+    background_jobs = jobs.start(app.state.db)
+    events.start()
     yield
+    await events.stop()
+    jobs.stop(background_jobs)
     await database_config.teardown(app)
 
 
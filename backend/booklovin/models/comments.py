@@ -2,7 +2,8 @@
 
 # Ideally, these should be in booklovin.models.comment or booklovin.models.post
 from booklovin.models.base import FlexModel, UserObject
-from pydantic import field_validator
+from booklovin.models.users import Author
+from pydantic import BaseModel, field_validator
 import bleach
 
 
@@ -16,4 +17,10 @@ class NewComment(FlexModel):
         return bleach.clean(v, tags=[], attributes={}, strip=True)
 
 
-class Comment(UserObject, NewComment): ...
+class Comment(UserObject, NewComment):
+    author: Author | None = None  # filled when responding, see services.authors
+
+
+class CommentPage(BaseModel):
+    comments: list[Comment]
+    next: str | None = None  # opaque cursor of the following page
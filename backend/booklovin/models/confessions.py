@@ -1,4 +1,5 @@
 from booklovin.models.base import FlexModel, UserObject
+from booklovin.models.users import Author
 from pydantic import Field
 import bleach
 
@@ -12,4 +13,5 @@ class NewConfession(FlexModel):
         return bleach.clean(v, tags=[], attributes={}, strip=True)
 
 
-class Confession(UserObject, NewConfession): ...
+class Confession(UserObject, NewConfession):
+    author: Author | None = None  # filled when responding, see services.authors
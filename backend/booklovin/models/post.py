@@ -1,5 +1,6 @@
-from typing import List
+from typing import List, Literal
 from booklovin.models.base import FlexModel, UserObject
+from booklovin.models.users import Author
 from pydantic import BaseModel, Field, field_validator
 import bleach
 
@@ -18,6 +19,57 @@ class NewPost(FlexModel):
 
 class Post(NewPost, UserObject):
     reactions: dict[str, int] = Field(default_factory=dict)
+    likes: int = 0  # denormalized count of the likes collection
+    commentCount: int = 0  # denormalized count of the comments collection
+    author: Author | None = None  # filled when responding, see services.authors
+
+
+# how the list endpoints return posts: whole, or as PostSummary
+PostView = Literal["full", "summary"]
+SUMMARY_LENGTH = 280
+
+
+class PostSummary(UserObject, FlexModel):
+    """Light version of a post for the list views, see `PostView`."""
+
+    title: str
+    excerpt: str  # the first SUMMARY_LENGTH characters of the content
+    truncated: bool  # whether the content is longer than the excerpt
+    imageCount: int = 0
+    reactions: dict[str, int] = Field(default_factory=dict)
+    likes: int = 0
+    commentCount: int = 0
+    author: Author | None = None
+
+    @classmethod
+    def from_post(cls, post: Post) -> "PostSummary":
+        return cls.model_validate({
+            **post.model_dump(include={"uid", "authorId", "title", "reactions", "likes", "commentCount", "author"}),
+            "creationTime": post.creationTime,
+            "excerpt": post.content[:SUMMARY_LENGTH],
+            "truncated": len(post.content) > SUMMARY_LENGTH,
+            "imageCount": len(post.imageUrls),
+        })
+
+
+# maintained by the backends, never taken from an update payload
+POST_READ_ONLY_FIELDS = {"uid", "authorId", "creationTime", "likes", "commentCount", "reactions", "author"}
+
+
+# keyset pagination position: (creationTime timestamp, uid) of the last post seen
+PostKey = tuple[float, str]
+
+
+class PostPage(BaseModel):
+    posts: list[Post] | list[PostSummary]
+    next: str | None = None  # opaque cursor of the following page
+
+
+class LikeState(BaseModel):
+    """State of a post after a like toggle."""
+
+    liked: bool
+    likes: int
 
 
 class Count(BaseModel):
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from .base import FlexModel
-from .post import Post
+from .post import Post, PostSummary
 
 class UserStats(BaseModel):
     books_read_count: int = Field(default=0)
@@ -28,7 +28,7 @@ class UserPublic(BaseModel):
 class UserProfile(FlexModel):
     """The complete data for a user's profile page."""
     user: UserPublic
-    posts: List[Post]
+    posts: List[Post] | List[PostSummary]
 
 class UpdateQuoteRequest(BaseModel):
     quote: str
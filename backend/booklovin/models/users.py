@@ -4,7 +4,7 @@ from typing import Optional, List
 from uuid import uuid4
 
 import bleach
-from pydantic import Field, field_serializer, field_validator, EmailStr
+from pydantic import BaseModel, Field, field_serializer, field_validator, EmailStr
 
 from booklovin.models.base import FlexModel
 
@@ -65,3 +65,35 @@ class User(FlexModel):
     @field_serializer("lastJournalDate")
     def to_json_lastJournalDate(self, v: datetime, _) -> float | None:
         return v.timestamp() if v else None
+
+
+class Author(BaseModel):
+    """Public identity shown along the content of a user, never stored with it."""
+
+    uid: str
+    penName: str
+
+
+class Principal(BaseModel):
+    """Identity of the caller, as carried by the access token claims."""
+
+    uid: str
+    email: str
+    name: str
+    role: UserRole = UserRole.STANDARD
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(uid=user.uid, email=user.email, name=user.name, role=user.role)
+
+
+class RevokedToken(BaseModel):
+    """An access token revoked before its expiration."""
+
+    jti: str
+    userId: str
+    expiresAt: datetime
+
+
+class TokenRevocation(BaseModel):
+    token: str
@@ -0,0 +1,56 @@
+"""Request-scoped batch loading of the authors shown along posts, comments and confessions.
+
+Lists only carry `authorId`: the loader gathers the ids of a whole response and resolves
+the names with a single users query, instead of one lookup per item.
+"""
+
+from typing import Any, Iterable, TypeVar, overload
+
+from booklovin.models.comments import Comment
+from booklovin.models.confessions import Confession
+from booklovin.models.post import Post, PostSummary
+from booklovin.models.users import Author
+from booklovin.services import database
+from fastapi import Request
+
+Authored = TypeVar("Authored", Post, PostSummary, Comment, Confession)
+
+
+class AuthorLoader:
+    def __init__(self, db: Any):
+        self.db = db
+        self._names: dict[str, str | None] = {}  # None: unknown user, not asked again
+
+    async def load(self, uids: Iterable[str]) -> dict[str, str | None]:
+        """Resolve the names of `uids` not seen yet during this request, returns every name known so far."""
+        missing = list({uid for uid in uids if uid not in self._names})
+        if missing:
+            names = await database.users.get_names(self.db, missing)
+            self._names.update({uid: names.get(uid) for uid in missing})
+        return self._names
+
+    # one overload per model: mypy then accepts the `list[Post] | list[PostSummary]` of the post views
+    @overload
+    async def hydrate(self, items: list[Post]) -> list[Post]: ...
+    @overload
+    async def hydrate(self, items: list[PostSummary]) -> list[PostSummary]: ...
+    @overload
+    async def hydrate(self, items: list[Comment]) -> list[Comment]: ...
+    @overload
+    async def hydrate(self, items: list[Confession]) -> list[Confession]: ...
+
+    async def hydrate(self, items: list[Authored]) -> list[Authored]:
+        """Copies of `items` with their `author` filled in."""
+        names = await self.load(item.authorId for item in items)
+        return [
+            item.model_copy(update={"author": Author(uid=item.authorId, penName=name)}) if (name := names.get(item.authorId)) else item
+            for item in items
+        ]
+
+    async def hydrate_one(self, item: Authored) -> Authored:
+        return (await self.hydrate([item]))[0]
+
+
+def get_author_loader(request: Request) -> AuthorLoader:
+    """Dependency, FastAPI shares the instance between the dependants of a request."""
+    return AuthorLoader(request.app.state.db)
@@ -7,10 +7,12 @@ from booklovin.models.comments import Comment
 from booklovin.models.journals import JournalEntry
 from booklovin.models.letters import Letter
 from booklovin.models.post import Post
-from booklovin.models.users import User
+from booklovin.models.users import RevokedToken, User
 from booklovin.services.interfaces import ServiceSetup
 from fastapi import FastAPI
 
+from .search import InvertedIndex
+
 DB_FILE = "/tmp/booklovin_mock.db"
 
 
@@ -37,9 +39,17 @@ class State:
     users: list[User] = field(default_factory=list)
     users_count: int = 0
     likes: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+    reactions: dict[str, dict[str, str]] = field(default_factory=lambda: defaultdict(dict))  # post -> user -> reaction
     journal_entries: dict[str, list[JournalEntry]] = field(default_factory=lambda: defaultdict(list))
     comments: dict[str, list] = field(default_factory=lambda: defaultdict(list))
     letters: list[Letter] = field(default_factory=list)
+    revoked_tokens: dict[str, RevokedToken] = field(default_factory=dict)
+    like_buckets: dict[int, dict[str, int]] = field(default_factory=dict)  # hour -> post uid -> likes
+    popular: dict[str, int] = field(default_factory=dict)  # post uid -> likes in the window
+    follows: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))  # follower -> authors
+    timelines: dict[str, list[str]] = field(default_factory=dict)  # user -> post uids, see timeline.py
+    cleanups: list[dict] = field(default_factory=list)  # deleted posts left to purge
+    search_index: InvertedIndex = field(default_factory=InvertedIndex, repr=False)  # not saved, rebuilt when loading
 
     def debug(self):
         def _show_list(title, item):
@@ -62,7 +72,14 @@ class State:
             "users_count": self.users_count,
             "journal_entries": {k: [je.model_dump() for je in v] for k, v in self.journal_entries.items()},
             "likes": {k: list(v) for k, v in self.likes.items()},
+            "reactions": self.reactions,
             "comments": {k: [c.model_dump() for c in v] for k, v in self.comments.items()},
+            "revoked_tokens": [t.model_dump() for t in self.revoked_tokens.values()],
+            "like_buckets": {str(hour): bucket for hour, bucket in self.like_buckets.items()},  # json keys are strings
+            "popular": self.popular,
+            "follows": {k: list(v) for k, v in self.follows.items()},
+            "timelines": self.timelines,
+            "cleanups": self.cleanups,
         })
         with open(DB_FILE, "w") as f:
             f.write(json_str)
@@ -74,12 +91,24 @@ class State:
             self.users_count = data["users_count"]
             self.users = colMap(data["users"], User)
             self.posts = colMap(data["posts"], Post)
+            self.search_index = InvertedIndex()
+            for post in self.posts:
+                self.search_index.add(post)
             self.likes = defaultdict(set)
             self.likes.update({k: set(v) for k, v in data["likes"].items()})
+            self.reactions = defaultdict(dict)
+            self.reactions.update(data.get("reactions", {}))
             self.journal_entries = defaultdict(list)
             self.journal_entries.update({k: colMap(v, JournalEntry) for k, v in data["journal_entries"].items()})
             self.comments = defaultdict(list)
             self.comments.update({k: colMap(v, Comment) for k, v in data.get("comments", {}).items()})
+            self.revoked_tokens = {t["jti"]: RevokedToken.model_validate(t) for t in data.get("revoked_tokens", [])}
+            self.like_buckets = {int(h): b for h, b in data.get("like_buckets", {}).items()}
+            self.popular = data.get("popular", {})
+            self.follows = defaultdict(set)
+            self.follows.update({k: set(v) for k, v in data.get("follows", {}).items()})
+            self.timelines = data.get("timelines", {})
+            self.cleanups = data.get("cleanups", [])
 
 
 class MockSetup(ServiceSetup):
@@ -4,6 +4,7 @@ from booklovin.models.errors import ErrorCode, UserError, gen_error
 from booklovin.services.streak_logic import calculate_streak_changes
 from booklovin.models.journals import JournalEntry, JournalEntryUpdate
 from booklovin.models.users import User
+from booklovin.services import user_cache
 
 from .core import State
 from .users import get as get_user
@@ -19,6 +20,7 @@ async def trigger_new_journal_actions(db: State, user: User, entry_date: datetim
     if streak_data:
         # update user data
         (await get_user(db, uid=user.uid)).update(streak_data)
+        user_cache.invalidate(user.email)
 
 
 async def create(db: State, entry: JournalEntry, user: User) -> None | UserError:
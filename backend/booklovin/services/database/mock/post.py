@@ -1,12 +1,17 @@
 """Database helpers for mocked db: Posts"""
 
-from booklovin.core.settings import RECENT_POSTS_LIMIT
+import heapq
+import time
+
+from booklovin.core.settings import POPULAR_POSTS_LIMIT, POPULAR_WINDOW_HOURS, RECENT_POSTS_LIMIT
+from booklovin.core.storage import delete_uploaded_images
 from booklovin.models.errors import UserError
-from booklovin.models.post import Post
+from booklovin.models.post import POST_READ_ONLY_FIELDS, LikeState, Post, PostKey, PostSummary, PostView
 from booklovin.models.comments import Comment
 from booklovin.models.users import User
 from booklovin.services import errors
 
+from . import timeline
 from .core import State
 
 
@@ -14,37 +19,129 @@ async def create(db: State, post: Post) -> None | UserError:
     """create a post"""
     db.posts.append(post)
     db.posts_count += 1
+    db.search_index.add(post)
+    timeline.fan_out(db, post)
     db.save()
     return None
 
 
-async def get_all(db: State, start: int, end: int) -> list[Post]:
+def _as_view(posts: list[Post], view: PostView) -> list[Post] | list[PostSummary]:
+    return [PostSummary.from_post(p) for p in posts] if view == "summary" else posts
+
+
+async def get_all(db: State, start: int, end: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
     """get all posts"""
-    return db.posts[start:end]
+    return _as_view(db.posts[start:end], view)
+
+
+async def get_page(db: State, after: PostKey | None, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """get up to `limit` posts (most recent first) following the `after` position"""
+    posts = sorted(db.posts, key=lambda p: (p.creationTime.timestamp(), p.uid), reverse=True)
+    if after:
+        posts = [p for p in posts if (p.creationTime.timestamp(), p.uid) < tuple(after)]
+    return _as_view(posts[:limit], view)
+
 
+async def search(db: State, query: str, offset: int, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """get the posts matching `query`, best matches first"""
+    return _as_view(db.search_index.search(query)[offset : offset + limit], view)
 
-async def like(db: State, post_id: str, user_id: str) -> None | UserError:
-    """like a post"""
+
+async def like(db: State, post_id: str, user_id: str) -> LikeState | UserError:
+    """(toggle) like a post"""
     post = await get_one(db, post_id)
     if not post:
         return errors.POST_NOT_FOUND
-    db.likes[post_id].add(user_id)
+    likes = db.likes[post_id]
+    liked = user_id not in likes
+    if liked:
+        likes.add(user_id)
+    else:
+        likes.discard(user_id)
+    _count_popular(db, post_id, 1 if liked else -1)
+    post.likes = len(likes)
     db.save()
-    return None
+    return LikeState(liked=liked, likes=post.likes)
+
+
+async def reconcile_likes(db: State) -> int:
+    """repair the posts `likes` counters from the likes sets"""
+    fixed = 0
+    for post in db.posts:
+        expected = len(db.likes.get(post.uid, ()))
+        if post.likes != expected:
+            post.likes = expected
+            fixed += 1
+    if fixed:
+        db.save()
+    return fixed
+
+
+async def react(db: State, post_id: str, user_id: str, reaction_type: str) -> dict[str, int] | UserError:
+    """Adds, removes (same reaction again), or changes a user's reaction to a post."""
+    post = await get_one(db, post_id)
+    if not post:
+        return errors.POST_NOT_FOUND
+    reactions = db.reactions[post_id]
+    old_type = reactions.pop(user_id, None)
+    if old_type:
+        post.reactions[old_type] = post.reactions.get(old_type, 0) - 1
+    if old_type != reaction_type:
+        reactions[user_id] = reaction_type
+        post.reactions[reaction_type] = post.reactions.get(reaction_type, 0) + 1
+    db.save()
+    return post.reactions
+
+
+async def get_recent(db: State, user: User, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """Returns a list of recent subscribed posts, from the user's home timeline"""
+    return await get_many(db, timeline.read(db, user.uid, RECENT_POSTS_LIMIT), view)
 
 
-async def get_recent(db: State, user: User) -> list[Post] | UserError:
-    """Returns a list of recent subscribed posts"""
-    return db.posts[:RECENT_POSTS_LIMIT]  # Mocked recent posts
+def _current_hour() -> int:
+    return int(time.time() // 3600)
 
 
-async def get_popular(db: State) -> list[Post] | UserError:
-    """Returns the most popular posts."""
-    sorted_likes = sorted(db.likes.items(), key=lambda x: len(x[1]), reverse=True)
-    top_likes = sorted_likes[:RECENT_POSTS_LIMIT]
-    results = [await get_one(db, post_id) for post_id, _ in top_likes]
-    assert None not in results
-    return results  # type: ignore
+def _count_popular(db: State, post_id: str, delta: int) -> None:
+    """update the hourly buckets and the popular posts leaderboard"""
+    hour = _current_hour()
+    if delta < 0:
+        # likes aren't timestamped here, take it back from the most recent bucket having one
+        hour = next((h for h in sorted(db.like_buckets, reverse=True) if db.like_buckets[h].get(post_id)), -1)
+        if hour < 0:
+            return
+    bucket = db.like_buckets.setdefault(hour, {})
+    bucket[post_id] = bucket.get(post_id, 0) + delta
+    db.popular[post_id] = db.popular.get(post_id, 0) + delta
+
+
+async def seed_popular(db: State) -> int:
+    """rank the liked posts when there's no leaderboard yet (likes aren't timestamped: they count as of now)"""
+    if db.like_buckets or db.popular:
+        return 0
+    liked = {post_id: len(users) for post_id, users in db.likes.items() if users}
+    if liked:
+        db.like_buckets[_current_hour()] = dict(liked)
+        db.popular = dict(liked)
+        db.save()
+    return len(liked)
+
+
+async def roll_popular(db: State) -> int:
+    """drop the buckets out of the popular posts window"""
+    cutoff = _current_hour() - POPULAR_WINDOW_HOURS
+    expired = [h for h in db.like_buckets if h <= cutoff]
+    for hour in expired:
+        for post_id, likes in db.like_buckets.pop(hour).items():
+            db.popular[post_id] = db.popular.get(post_id, 0) - likes
+    db.popular = {post_id: likes for post_id, likes in db.popular.items() if likes > 0}
+    return len(expired)
+
+
+async def get_popular(db: State, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """Returns the most liked posts of the window."""
+    top = heapq.nlargest(POPULAR_POSTS_LIMIT, ((likes, post_id) for post_id, likes in db.popular.items() if likes > 0))
+    return await get_many(db, [post_id for _, post_id in top], view)
 
 
 async def exists(db: State, post_id: str) -> bool:
@@ -58,39 +155,65 @@ async def get_one(db: State, post_id: str) -> Post | None:
     """get one post"""
     for post in db.posts:
         if post.uid == post_id:
-            if post_id in db.likes:
-                post.likes = len(db.likes[post_id])
             return post
     return None
 
 
-async def update(db: State, post_id: str, post_data: Post) -> None | UserError:
-    """Updates an existing post."""
+async def get_many(db: State, post_ids: list[str], view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """get posts in the order of `post_ids`, skipping the missing ones"""
+    posts = {post.uid: post for post in db.posts}
+    return _as_view([posts[post_id] for post_id in post_ids if post_id in posts], view)
+
+
+async def update(db: State, post_id: str, post_data: Post, author_id: str | None = None) -> None | UserError:
+    """Updates an existing post, only if written by `author_id` when given."""
     post = await get_one(db, post_id)
-    if post:
-        post.update(post_data)
-        db.save()
-    else:
+    if not post:
         return errors.POST_NOT_FOUND
+    if author_id is not None and post.authorId != author_id:
+        return errors.FORBIDDEN
+    post.update(post_data.model_dump(exclude_unset=True, exclude=POST_READ_ONLY_FIELDS))
+    db.search_index.add(post)
+    db.save()
     return None
 
 
-async def delete(db: State, post_id: str) -> None | UserError:
-    """Deletes a post by its ID."""
-    if post_id in db.likes:
-        del db.likes[post_id]
+async def delete(db: State, post_id: str, author_id: str | None = None) -> None | UserError:
+    """Deletes a post by its ID, only if written by `author_id` when given."""
     post = await get_one(db, post_id)
     if not post:
         return errors.POST_NOT_FOUND
+    if author_id is not None and post.authorId != author_id:
+        return errors.FORBIDDEN
     try:
         db.posts.remove(post)
     except ValueError:
         return errors.POST_NOT_FOUND
     db.posts_count -= 1
+    db.search_index.remove(post_id)
+    db.cleanups.append({"post_id": post_id, "imageUrls": post.imageUrls})
     db.save()
     return None
 
 
+async def cleanup_deleted(db: State) -> int:
+    """Purge what deleted posts left behind, returns the number of completed cleanups."""
+    completed = 0
+    while db.cleanups:
+        task = db.cleanups[0]
+        post_id = task["post_id"]
+        for collection in (db.likes, db.reactions, db.comments, db.popular):
+            collection.pop(post_id, None)
+        for bucket in db.like_buckets.values():
+            bucket.pop(post_id, None)
+        timeline.remove_post(db, post_id)
+        await delete_uploaded_images(task["imageUrls"])
+        db.cleanups.pop(0)
+        db.save()
+        completed += 1
+    return completed
+
+
 async def add_comment(db: State, comment: Comment) -> None | UserError:
     """Add a comment to a post.
 
@@ -104,6 +227,9 @@ async def add_comment(db: State, comment: Comment) -> None | UserError:
         None on success, UserError on failure
     """
     db.comments[comment.postId].append(comment)
+    post = await get_one(db, comment.postId)
+    if post:
+        post.commentCount += 1
     db.save()
     return None
 
@@ -125,6 +251,32 @@ async def get_comments(db: State, post_id: str) -> None | UserError | list[Comme
     return db.comments.get(post_id, [])
 
 
+async def get_comment(db: State, post_id: str, comment_id: str) -> Comment | None:
+    """Get one comment of a post."""
+    return next((c for c in db.comments.get(post_id, []) if c.uid == comment_id), None)
+
+
+async def get_comments_page(db: State, post_id: str, after: PostKey | None, limit: int) -> list[Comment]:
+    """Returns up to `limit` comments of a post (most recent first) following the `after` position."""
+    comments = sorted(db.comments.get(post_id, []), key=lambda c: (c.creationTime.timestamp(), c.uid), reverse=True)
+    if after:
+        comments = [c for c in comments if (c.creationTime.timestamp(), c.uid) < after]
+    return comments[:limit]
+
+
+async def reconcile_comment_counts(db: State) -> int:
+    """repair the posts `commentCount` counters from the comments lists (posts saved before the counter)"""
+    fixed = 0
+    for post in db.posts:
+        expected = len(db.comments.get(post.uid, ()))
+        if post.commentCount != expected:
+            post.commentCount = expected
+            fixed += 1
+    if fixed:
+        db.save()
+    return fixed
+
+
 async def delete_comment(db: State, post_id: str, comment_id: str) -> None | UserError:
     """Delete all comments for a post.
 
@@ -139,6 +291,11 @@ async def delete_comment(db: State, post_id: str, comment_id: str) -> None | Use
         if comment_id:
             # Remove a specific comment
             db.comments[post_id] = [c for c in db.comments[post_id] if c.uid != comment_id]
+        else:
+            db.comments[post_id] = []
+        post = await get_one(db, post_id)
+        if post:
+            post.commentCount = len(db.comments[post_id])
         db.save()
 
     return None
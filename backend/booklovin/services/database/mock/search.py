@@ -0,0 +1,50 @@
+"""In-memory inverted index of the posts, the mock counterpart of the mongo text index."""
+
+import re
+from collections import Counter, defaultdict
+
+from booklovin.core.settings import SEARCH_TITLE_WEIGHT
+from booklovin.models.post import Post
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+class InvertedIndex:
+    """Term -> post uid -> weight, kept up to date by the post writes."""
+
+    def __init__(self):
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._terms: dict[str, set[str]] = {}  # post uid -> indexed terms, to remove a post
+        self._posts: dict[str, Post] = {}
+
+    def add(self, post: Post) -> None:
+        """Index a post, replacing its previous version."""
+        self.remove(post.uid)
+        weights = Counter(tokenize(post.content))
+        for term in tokenize(post.title):
+            weights[term] += SEARCH_TITLE_WEIGHT
+        for term, weight in weights.items():
+            self._postings[term][post.uid] = weight
+        self._terms[post.uid] = set(weights)
+        self._posts[post.uid] = post
+
+    def remove(self, uid: str) -> None:
+        self._posts.pop(uid, None)
+        for term in self._terms.pop(uid, ()):
+            postings = self._postings[term]
+            postings.pop(uid, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str) -> list[Post]:
+        """Posts matching any term of `query`, best matches first (then most recent)."""
+        scores: dict[str, int] = defaultdict(int)
+        for term in set(tokenize(query)):
+            for uid, weight in self._postings.get(term, {}).items():
+                scores[uid] += weight
+        ranked = sorted(scores.items(), key=lambda s: (s[1], self._posts[s[0]].creationTime), reverse=True)
+        return [self._posts[uid] for uid, _ in ranked]
@@ -0,0 +1,66 @@
+"""Materialized home timelines for the mock db, shared by the users (follow) and posts helpers.
+
+`State.timelines` maps a user to the uids of the most recent posts of the authors they
+follow (and their own), newest first. Unlike mongo, every author is fanned out to.
+"""
+
+from booklovin.core.settings import TIMELINE_LENGTH
+from booklovin.models.post import Post
+
+from .core import State
+
+
+def _merge(db: State, owner_id: str, posts: list[Post]) -> None:
+    known = {post.uid: post for post in db.posts}
+    entries = {uid: known[uid] for uid in db.timelines.get(owner_id, []) if uid in known}
+    entries.update({post.uid: post for post in posts})
+    ranked = sorted(entries.values(), key=lambda p: (p.creationTime, p.uid), reverse=True)
+    db.timelines[owner_id] = [post.uid for post in ranked[:TIMELINE_LENGTH]]
+
+
+def _authored(db: State, author_ids: set[str]) -> list[Post]:
+    return [post for post in db.posts if post.authorId in author_ids]
+
+
+def fan_out(db: State, post: Post) -> None:
+    """Push a new post to the timelines of its author and followers."""
+    followers = [follower for follower, authors in db.follows.items() if post.authorId in authors]
+    for owner_id in (post.authorId, *followers):
+        if owner_id in db.timelines:
+            db.timelines[owner_id].insert(0, post.uid)
+            del db.timelines[owner_id][TIMELINE_LENGTH:]
+        else:
+            build(db, owner_id)
+
+
+def on_follow(db: State, follower_id: str, author_id: str) -> None:
+    if follower_id in db.timelines:
+        _merge(db, follower_id, _authored(db, {author_id}))
+    else:
+        build(db, follower_id)
+
+
+def on_unfollow(db: State, follower_id: str, author_id: str) -> None:
+    authored = {post.uid for post in _authored(db, {author_id})}
+    if follower_id in db.timelines:
+        db.timelines[follower_id] = [uid for uid in db.timelines[follower_id] if uid not in authored]
+
+
+def remove_post(db: State, post_id: str) -> None:
+    """Drop a deleted post from the timelines listing it."""
+    for owner_id, uids in db.timelines.items():
+        if post_id in uids:
+            db.timelines[owner_id] = [uid for uid in uids if uid != post_id]
+
+
+def build(db: State, owner_id: str) -> None:
+    """Materialize the timeline of a user who has none yet (follows saved before timelines existed)."""
+    db.timelines[owner_id] = []
+    _merge(db, owner_id, _authored(db, db.follows.get(owner_id, set()) | {owner_id}))
+
+
+def read(db: State, owner_id: str, limit: int) -> list[str]:
+    """Returns the uids of the `limit` most recent posts of the timeline, building it if needed."""
+    if owner_id not in db.timelines:
+        build(db, owner_id)
+    return db.timelines[owner_id][:limit]
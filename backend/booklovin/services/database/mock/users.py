@@ -1,8 +1,12 @@
 """Database helper for mock db: Users"""
 
+from datetime import datetime, timezone
+
 from booklovin.models.errors import UserError
-from booklovin.models.users import User
+from booklovin.models.users import RevokedToken, User
+from booklovin.services import errors
 
+from . import timeline
 from .core import State
 
 
@@ -19,3 +23,45 @@ async def get(db: State, email: str | None = None, uid: str | None = None) -> Us
         if match_func(user):
             return user
     return None
+
+
+async def get_names(db: State, uids: list[str]) -> dict[str, str]:
+    wanted = set(uids)
+    return {u.uid: u.name for u in db.users if u.uid in wanted}
+
+
+async def revoke_token(db: State, token: RevokedToken) -> None | UserError:
+    db.revoked_tokens[token.jti] = token
+    db.save()
+    return None
+
+
+async def get_revoked_tokens(db: State) -> list[RevokedToken]:
+    now = datetime.now(timezone.utc)
+    return [t for t in db.revoked_tokens.values() if t.expiresAt > now]
+
+
+async def follow(db: State, follower_id: str, author_id: str) -> None | UserError:
+    if follower_id == author_id:
+        return errors.CANNOT_FOLLOW_SELF
+    if not any(u.uid == author_id for u in db.users):
+        return errors.NOT_FOUND
+    if author_id in db.follows.get(follower_id, ()):
+        return None  # already following
+    db.follows[follower_id].add(author_id)
+    timeline.on_follow(db, follower_id, author_id)
+    db.save()
+    return None
+
+
+async def unfollow(db: State, follower_id: str, author_id: str) -> None | UserError:
+    if author_id not in db.follows.get(follower_id, ()):
+        return errors.NOT_FOUND
+    db.follows[follower_id].discard(author_id)
+    timeline.on_unfollow(db, follower_id, author_id)
+    db.save()
+    return None
+
+
+async def get_following(db: State, user_id: str) -> list[str]:
+    return list(db.follows.get(user_id, ()))
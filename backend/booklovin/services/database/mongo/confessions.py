@@ -8,7 +8,7 @@ from booklovin.models.errors import UserError
 async def create(db: Any, user: User, confession: NewConfession) -> Confession:
     collection = db["confessions"]
     confession = Confession(authorId=user.uid, **confession.dict())
-    await collection.insert_one(confession.dict())
+    await collection.insert_one(confession.model_dump(exclude={"author"}))
     return confession
 
 
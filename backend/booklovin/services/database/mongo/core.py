@@ -3,6 +3,7 @@ from fastapi import FastAPI
 import pymongo
 from pymongo import TEXT
 from booklovin.core.config import DB_NAME, MONGO_SERVER
+from booklovin.core.settings import SEARCH_TITLE_WEIGHT
 from booklovin.services.interfaces import ServiceSetup
 
 
@@ -13,18 +14,34 @@ class MongoSetup(ServiceSetup):
         app.state.db = db
 
         await db.users.create_index([("email", 1)], unique=True)
+        await db.users.create_index([("uid", 1)])
+        await db.revoked_tokens.create_index([("jti", 1)], unique=True)
+        await db.revoked_tokens.create_index([("expiresAt", 1)], expireAfterSeconds=0)
 
         await db.posts.create_index([("creationTime", -1)])
+        await db.posts.create_index([("creationTime", -1), ("uid", -1)])
         await db.posts.create_index([("authorId", 1)])
+        await db.posts.create_index([("authorId", 1), ("creationTime", -1)])
         await db.posts.create_index([("uid", 1)], unique=True)
+        await db.posts.create_index([("title", TEXT), ("content", TEXT)], weights={"title": SEARCH_TITLE_WEIGHT}, name="posts_text")
+
+        await db.post_cleanups.create_index([("leaseUntil", 1), ("queuedAt", 1)])
+
+        await db.follows.create_index([("follower", 1), ("author", 1)], unique=True)
+        await db.follows.create_index([("author", 1)])
+        await db.timelines.create_index([("owner", 1)], unique=True)
 
         await db.likes.create_index([("post_id", 1), ("user_id", 1)], unique=True)
         await db.likes.create_index([("liked_at", -1), ("post_id", 1)])
+        await db.like_buckets.create_index([("hour", 1), ("post_id", 1)], unique=True)
+        await db.popular.create_index([("post_id", 1)], unique=True)
+        await db.popular.create_index([("likes", -1)])
 
         await db.reactions.create_index([("post_id", 1), ("user_id", 1)], unique=True)
         await db.reactions.create_index([("post_id", 1)])
 
         await db.comments.create_index([("postId", 1), ("creationTime", -1)])
+        await db.comments.create_index([("postId", 1), ("creationTime", -1), ("uid", -1)])
         await db.comments.create_index([("uid", 1)], unique=True)
 
         await db.journals.create_index([("uid", 1)], unique=True)
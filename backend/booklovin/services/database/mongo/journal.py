@@ -5,7 +5,7 @@ from datetime import datetime, timezone
 from booklovin.models.errors import UserError
 from booklovin.models.journals import JournalEntry, JournalEntryUpdate
 from booklovin.models.users import User
-from booklovin.services import errors
+from booklovin.services import errors, user_cache
 from booklovin.services.streak_logic import calculate_streak_changes
 from pymongo.asynchronous.database import AsyncDatabase as Database
 
@@ -26,6 +26,7 @@ async def trigger_new_journal_actions(db: Database, user: User, entry_date: date
     # Only update if we have changes
     if streak_data:
         await db.users.update_one({"uid": user.uid}, {"$set": streak_data})
+        user_cache.invalidate(user.email)
 
 
 async def create(db: Database, entry: JournalEntry, user: User) -> None | UserError:
@@ -1,43 +1,120 @@
 """Database helpers for mongo: posts"""
 
+import asyncio
+import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Mapping, Sequence, cast
 
 import pymongo.errors
-from booklovin.core.settings import RECENT_POSTS_LIMIT
+from pymongo import ReturnDocument, UpdateOne
+from booklovin.core.settings import (
+    CLEANUP_BATCH_SIZE,
+    CLEANUP_LEASE,
+    CLEANUP_ORPHANS_INTERVAL,
+    POPULAR_POSTS_LIMIT,
+    POPULAR_WINDOW_HOURS,
+    RECENT_POSTS_LIMIT,
+)
+from booklovin.core.storage import delete_uploaded_images
 from booklovin.models.comments import Comment
 from booklovin.models.errors import UserError
-from booklovin.models.post import Post
+from booklovin.models.post import POST_READ_ONLY_FIELDS, LikeState, Post, PostKey, PostSummary, PostView
 from booklovin.models.users import User
+from booklovin.services import errors
 from pymongo.asynchronous.database import AsyncDatabase as Database
 
+from . import timeline
+from .projections import load_posts, post_projection
+
+logger = logging.getLogger(__name__)
+
+
+def _owned(post_id: str, author_id: str | None) -> dict:
+    return {"uid": post_id} if author_id is None else {"uid": post_id, "authorId": author_id}
+
+
+async def _not_owned(db: Database, post_id: str) -> UserError:
+    """Tells why an owner-scoped write matched nothing."""
+    return errors.FORBIDDEN if await exists(db, post_id) else errors.POST_NOT_FOUND
+
+
+async def like(db: Database, post_id: str, user_id: str) -> LikeState | UserError:
+    """(toggle) like a post, keeping the post `likes` counter in sync"""
+    like_filter = {"post_id": post_id, "user_id": user_id}
+    projection = {"_id": 0, "likes": 1}
+    # the delete is the "is it liked?" check: only insert if there was nothing to delete
+    if removed := await db.likes.find_one_and_delete(like_filter, projection={"liked_at": 1}):
+        # never below 0, even for a counter not reconciled yet
+        post = await db.posts.find_one_and_update(
+            {"uid": post_id, "likes": {"$gt": 0}}, {"$inc": {"likes": -1}}, projection=projection, return_document=ReturnDocument.AFTER
+        )
+        if "liked_at" in removed:  # likes older than the timestamps are out of the window anyway
+            await _count_popular(db, post_id, removed["liked_at"], -1)
+        return LikeState(liked=False, likes=post["likes"] if post else 0)
+    liked_at = datetime.now(timezone.utc)
+    try:
+        await db.likes.insert_one({**like_filter, "liked_at": liked_at})
+    except pymongo.errors.DuplicateKeyError:
+        # a concurrent request of the same user liked it first
+        post = await db.posts.find_one({"uid": post_id}, projection)
+        return LikeState(liked=True, likes=post["likes"] if post else 0)
+    post = await db.posts.find_one_and_update(
+        {"uid": post_id}, {"$inc": {"likes": 1}}, projection=projection, return_document=ReturnDocument.AFTER
+    )
+    if post is None:
+        await db.likes.delete_one(like_filter)
+        return errors.POST_NOT_FOUND
+    await _count_popular(db, post_id, liked_at, 1)
+    return LikeState(liked=True, likes=post["likes"])
 
-async def like(db: Database, post_id: str, user_id: str) -> None | UserError:
-    """(toggle) like a post"""
-    count = await db.likes.count_documents({"post_id": post_id, "user_id": user_id}, limit=1)
-    if count > 0:
-        await db.likes.delete_one({"post_id": post_id, "user_id": user_id})
-    else:
-        try:
-            await db.likes.insert_one({"post_id": post_id, "user_id": user_id, "liked_at": datetime.now(timezone.utc)})
-        except pymongo.errors.DuplicateKeyError:
-            # User has already liked the post
-            pass
-    return None
 
+async def reconcile_likes(db: Database) -> int:
+    """Repair the `likes` counters drifting from the likes collection, returns the number of fixed posts.
 
-async def _add_likes(db: Database, post: dict) -> dict:
-    post["likes"] = await db.likes.count_documents({"post_id": post["uid"]})
-    return post
+    Each fix is conditional on the counter read, so a like landing meanwhile isn't overwritten.
+    """
+    cursor = await db.likes.aggregate([{"$group": {"_id": "$post_id", "likes": {"$sum": 1}}}])
+    counts = {doc["_id"]: doc["likes"] async for doc in cursor}
+    fixes = []
+    async for post in db.posts.find({}, {"_id": 0, "uid": 1, "likes": 1}):
+        expected = counts.get(post["uid"], 0)
+        if post.get("likes") != expected:
+            fixes.append(UpdateOne({"uid": post["uid"], "likes": post.get("likes")}, {"$set": {"likes": expected}}))
+    if fixes:
+        await db.posts.bulk_write(fixes, ordered=False)
+    return len(fixes)
 
 
 async def create(db: Database, post: Post) -> None | UserError:
-    await db.posts.insert_one(post.model_dump())
+    await db.posts.insert_one(post.model_dump(exclude={"author"}))
+    await timeline.fan_out(db, post)
     return None
 
 
-async def get_all(db: Database, start: int, end: int) -> list[Post]:
-    return [Post.from_dict(p) for p in await db.posts.find({}).sort("creationTime", -1).skip(start).limit(end - start).to_list(length=None)]
+async def get_all(db: Database, start: int, end: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    cursor = db.posts.find({}, post_projection(view)).sort("creationTime", -1).skip(start).limit(end - start)
+    return load_posts(await cursor.to_list(length=None), view)
+
+
+async def get_page(db: Database, after: PostKey | None, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """Returns up to `limit` posts (most recent first) following the `after` position."""
+    query: dict = {}
+    if after:
+        creation_time, uid = after
+        query = {"$or": [{"creationTime": {"$lt": creation_time}}, {"creationTime": creation_time, "uid": {"$lt": uid}}]}
+    cursor = db.posts.find(query, post_projection(view)).sort([("creationTime", -1), ("uid", -1)]).limit(limit)
+    return load_posts(await cursor.to_list(length=limit), view)
+
+
+async def search(db: Database, query: str, offset: int, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """Returns the posts matching `query` (text index), best matches first."""
+    cursor = (
+        db.posts.find({"$text": {"$search": query}}, post_projection(view))
+        .sort([("score", {"$meta": "textScore"}), ("creationTime", -1)])
+        .skip(offset)
+        .limit(limit)
+    )
+    return load_posts(await cursor.to_list(length=limit), view)
 
 
 async def exists(db: Database, post_id: str) -> bool:
@@ -47,106 +124,235 @@ async def exists(db: Database, post_id: str) -> bool:
 async def get_one(db: Database, post_id: str) -> Post | None:
     post = await db.posts.find_one({"uid": post_id})
     if post:
-        await _add_likes(db, post)
         return Post.from_dict(post)
     return None
 
 
-async def update(db: Database, post_id: str, post_data: Post) -> None | UserError:
-    """Updates an existing post."""
-    update_data = post_data.model_dump(exclude_unset=True)  # Only update provided fields
-    await db.posts.update_one({"uid": post_id}, {"$set": update_data})
-    return None
+async def get_many(db: Database, post_ids: list[str], view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """get posts in the order of `post_ids`, skipping the missing ones (likes come from the denormalized counter)"""
+    if not post_ids:
+        return []
+    posts = {p["uid"]: p async for p in db.posts.find({"uid": {"$in": post_ids}}, post_projection(view))}
+    return load_posts((posts[uid] for uid in post_ids if uid in posts), view)
 
 
-async def delete(db: Database, post_id: str) -> None | UserError:
-    """Deletes a post by its ID."""
-    await db.posts.delete_one({"uid": post_id})
+async def update(db: Database, post_id: str, post_data: Post, author_id: str | None = None) -> None | UserError:
+    """Updates an existing post, only if written by `author_id` when given."""
+    update_data = post_data.model_dump(exclude_unset=True, exclude=POST_READ_ONLY_FIELDS)  # Only update provided fields
+    result = await db.posts.update_one(_owned(post_id, author_id), {"$set": update_data})
+    if result.matched_count == 0:
+        return await _not_owned(db, post_id)
     return None
 
 
-async def get_recent(db: Database, user: User) -> list[Post] | UserError:
-    """Returns a list of recent subscribed posts"""
-    result = (
-        await db.posts.find({
-            "authorId": user.uid,
-        })
-        .sort("creationTime", -1)
-        .limit(RECENT_POSTS_LIMIT)
-        .to_list()
-    )
-    return [Post.from_dict(p) for p in result]
+# collection -> field referencing the post, purged by `cleanup_deleted` in this order
+CASCADE = {"likes": "post_id", "reactions": "post_id", "comments": "postId", "like_buckets": "post_id", "popular": "post_id"}
 
 
-async def get_popular(db: Database) -> list[Post] | UserError:
+def _cleanup_task(post_id: str, image_urls: list[str]) -> dict:
+    return {
+        "post_id": post_id,
+        "imageUrls": image_urls,
+        "done": [],
+        "queuedAt": datetime.now(timezone.utc),
+        "leaseUntil": datetime.fromtimestamp(0, timezone.utc),
+    }
+
+
+async def delete(db: Database, post_id: str, author_id: str | None = None) -> None | UserError:
+    """Deletes a post by its ID, only if written by `author_id` when given.
+
+    Its likes, reactions, comments, timeline entries and images are left to `cleanup_deleted`,
+    which also finds what a delete interrupted before queuing its cleanup left behind.
     """
-    Retrieves the most popular posts within the last 'days_period' days.
+    post = await db.posts.find_one_and_delete(_owned(post_id, author_id), projection={"_id": 0, "imageUrls": 1})
+    if post is None:
+        return await _not_owned(db, post_id)
+    await db.post_cleanups.insert_one(_cleanup_task(post_id, post.get("imageUrls", [])))
+    return None
+
+
+async def _purge(db: Database, collection: str, field: str, post_id: str) -> None:
+    """Remove the documents referencing the post, by batches to keep each delete short."""
+    while ids := [d["_id"] async for d in db[collection].find({field: post_id}, {"_id": 1}).limit(CLEANUP_BATCH_SIZE)]:
+        await db[collection].delete_many({"_id": {"$in": ids}})
+
+
+_next_orphans_scan = 0.0  # monotonic time
+
+
+async def _queue_orphans(db: Database) -> None:
+    """Queue the cleanup of the posts deleted without one (interrupted right after the delete).
+
+    Their images can't be known anymore, only the documents are purged.
     """
-    days_period = 1
-
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_period)
-
-    pipeline = [
-        {"$match": {"liked_at": {"$gte": cutoff_date}}},
-        {"$group": {"_id": "$post_id", "likes": {"$sum": 1}}},
-        {"$sort": {"likes": -1}},
-        {"$limit": RECENT_POSTS_LIMIT},
-        {
-            "$lookup": {
-                "from": "posts",  # Name of your posts collection
-                "localField": "post_id",  # id in likes
-                "foreignField": "uid",  # id in posts
-                "as": "post_details",
-            }
-        },
-        {
-            # If post_details is an array (even of 1), unwind it.
-            # If a post was deleted after being liked, this will filter it out.
-            "$unwind": "$post_details"
-        },
-        {
-            # Promote the post_details to the root of the document
-            "$replaceRoot": {"newRoot": "$post_details"}
-        },
-    ]
-
-    workaround = cast(Sequence[Mapping], pipeline)
-    cursor = await db.likes.aggregate(workaround, batchSize=RECENT_POSTS_LIMIT)
-
-    popular_post_docs = await cursor.to_list(length=RECENT_POSTS_LIMIT)
-
-    return [Post.from_dict(doc) for doc in popular_post_docs]
-
-
-async def react(db: Database, post_id: str, user_id: str, reaction_type: str) -> None:
+    referenced: set[str] = set()
+    for collection, field in CASCADE.items():
+        referenced.update(await db[collection].distinct(field))
+    if not referenced:
+        return
+    existing = {p["uid"] async for p in db.posts.find({"uid": {"$in": list(referenced)}}, {"_id": 0, "uid": 1})}
+    queued = {c["post_id"] async for c in db.post_cleanups.find({}, {"_id": 0, "post_id": 1})}
+    orphans = referenced - existing - queued
+    if orphans:
+        logger.warning(f"Queuing the cleanup of {len(orphans)} posts deleted without one")
+        await db.post_cleanups.insert_many([_cleanup_task(post_id, []) for post_id in orphans])
+
+
+async def cleanup_deleted(db: Database) -> int:
+    """Purge what deleted posts left behind, returns the number of completed cleanups.
+
+    Each step is recorded once done, so an interrupted cleanup resumes where it stopped
+    once its lease expires (whichever worker picks it up). Every CLEANUP_ORPHANS_INTERVAL,
+    the posts deleted without a queued cleanup are looked for as well.
     """
-    Adds, removes, or changes a user's reaction to a post.
-    A user can only have one reaction per post.
+    global _next_orphans_scan
+    if time.monotonic() >= _next_orphans_scan:
+        _next_orphans_scan = time.monotonic() + CLEANUP_ORPHANS_INTERVAL
+        await _queue_orphans(db)
+    completed = 0
+    while True:
+        now = datetime.now(timezone.utc)
+        task = await db.post_cleanups.find_one_and_update(
+            {"leaseUntil": {"$lt": now}},
+            {"$set": {"leaseUntil": now + timedelta(seconds=CLEANUP_LEASE)}},
+            sort=[("queuedAt", 1)],
+        )
+        if task is None:
+            return completed
+        if await db.posts.find_one({"uid": task["post_id"]}, {"_id": 1}):
+            # an orphan scan racing a new post of that uid (or a restored one)
+            await db.post_cleanups.delete_one({"_id": task["_id"]})
+            continue
+        for collection, field in CASCADE.items():
+            if collection not in task["done"]:
+                await _purge(db, collection, field, task["post_id"])
+                await db.post_cleanups.update_one({"_id": task["_id"]}, {"$push": {"done": collection}})
+        if "timelines" not in task["done"]:
+            await timeline.remove_post(db, task["post_id"])
+            await db.post_cleanups.update_one({"_id": task["_id"]}, {"$push": {"done": "timelines"}})
+        await delete_uploaded_images(task["imageUrls"])
+        await db.post_cleanups.delete_one({"_id": task["_id"]})
+        completed += 1
+
+
+async def get_recent(db: Database, user: User, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """Returns a list of recent subscribed posts, from the user's home timeline"""
+    posts = await timeline.read(db, user.uid, RECENT_POSTS_LIMIT, view)
+    if posts is None:
+        # no timeline yet (never posted nor followed anyone since timelines exist)
+        await timeline.build(db, user.uid)
+        posts = await timeline.read(db, user.uid, RECENT_POSTS_LIMIT, view)
+    return posts or []
+
+
+def _current_hour() -> int:
+    return int(datetime.now(timezone.utc).timestamp() // 3600)
+
+
+async def _count_popular(db: Database, post_id: str, liked_at: datetime, delta: int) -> None:
+    """Report a like (or unlike) in its hourly bucket and in the popular posts leaderboard."""
+    hour = int(liked_at.replace(tzinfo=timezone.utc).timestamp() // 3600)
+    if hour <= _current_hour() - POPULAR_WINDOW_HOURS:
+        return  # this bucket was already rolled out of the window
+    await asyncio.gather(
+        db.like_buckets.update_one({"hour": hour, "post_id": post_id}, {"$inc": {"likes": delta}}, upsert=True),
+        db.popular.update_one({"post_id": post_id}, {"$inc": {"likes": delta}}, upsert=True),
+    )
+
+
+async def seed_popular(db: Database) -> int:
+    """Build the leaderboard from the likes of the window when it's empty, returns the number of ranked posts.
+
+    The counts are set, not added, so workers starting together can't count a like twice.
     """
-    existing_reaction = await db.reactions.find_one_and_delete({"post_id": post_id, "user_id": user_id})
+    if await db.like_buckets.find_one({}, {"_id": 1}):
+        return 0
+    since = datetime.fromtimestamp((_current_hour() - POPULAR_WINDOW_HOURS + 1) * 3600, timezone.utc)
+    hour = {"$toLong": {"$floor": {"$divide": [{"$toLong": "$liked_at"}, 3600 * 1000]}}}
+    cursor = await db.likes.aggregate([
+        {"$match": {"liked_at": {"$gte": since}}},
+        {"$group": {"_id": {"post_id": "$post_id", "hour": hour}, "likes": {"$sum": 1}}},
+    ])
+    buckets = [b async for b in cursor]
+    if not buckets:
+        return 0
+    totals: dict[str, int] = {}
+    for bucket in buckets:
+        totals[bucket["_id"]["post_id"]] = totals.get(bucket["_id"]["post_id"], 0) + bucket["likes"]
+    await db.like_buckets.bulk_write(
+        [UpdateOne(b["_id"], {"$set": {"likes": b["likes"]}}, upsert=True) for b in buckets],
+        ordered=False,
+    )
+    await db.popular.bulk_write(
+        [UpdateOne({"post_id": post_id}, {"$set": {"likes": likes}}, upsert=True) for post_id, likes in totals.items()],
+        ordered=False,
+    )
+    return len(totals)
 
-    update_query = {}
 
-    if existing_reaction:
-        old_reaction_type = existing_reaction["reaction_type"]
-        update_query[f"reactions.{old_reaction_type}"] = -1
+async def roll_popular(db: Database) -> int:
+    """Move the popular posts window forward, returns the number of expired buckets.
 
-        if old_reaction_type == reaction_type:
-            if update_query:
-                await db.posts.update_one({"uid": post_id}, {"$inc": update_query})
-            return
+    Each bucket is claimed with a delete, so concurrent workers never subtract it twice.
+    """
+    cutoff = _current_hour() - POPULAR_WINDOW_HOURS
+    rolled = 0
+    while bucket := await db.like_buckets.find_one_and_delete({"hour": {"$lte": cutoff}}):
+        await db.popular.update_one({"post_id": bucket["post_id"]}, {"$inc": {"likes": -bucket["likes"]}})
+        rolled += 1
+    if rolled:
+        await db.popular.delete_many({"likes": {"$lte": 0}})
+    return rolled
 
-    new_reaction_document = {
-        "post_id": post_id,
-        "user_id": user_id,
-        "reaction_type": reaction_type,
-        "reacted_at": datetime.now(timezone.utc),
-    }
-    await db.reactions.insert_one(new_reaction_document)
 
-    update_query[f"reactions.{reaction_type}"] = 1
+async def get_popular(db: Database, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """
+    Retrieves the most liked posts within the last POPULAR_WINDOW_HOURS, from the leaderboard.
+    """
+    ranking = await db.popular.find({"likes": {"$gt": 0}}, {"_id": 0}).sort("likes", -1).limit(POPULAR_POSTS_LIMIT).to_list()
+    # posts deleted since they were liked are skipped
+    return await get_many(db, [r["post_id"] for r in ranking], view)
+
 
-    await db.posts.update_one({"uid": post_id}, {"$inc": update_query})
+async def react(db: Database, post_id: str, user_id: str, reaction_type: str) -> dict[str, int] | UserError:
+    """
+    Adds, removes (same reaction again), or changes a user's reaction to a post.
+    A user can only have one reaction per post, returns the updated reaction counters.
+    """
+    mine = {"post_id": post_id, "user_id": user_id}
+    projection = {"_id": 0, "reactions": 1}
+    while True:
+        try:
+            # swapping the reaction in place tells which counters to move, whatever the concurrent taps
+            previous = await db.reactions.find_one_and_update(
+                mine,
+                {"$set": {"reaction_type": reaction_type, "reacted_at": datetime.now(timezone.utc)}},
+                projection={"_id": 0, "reaction_type": 1},
+                upsert=True,
+            )
+            break
+        except pymongo.errors.DuplicateKeyError:
+            continue  # lost the upsert race against a tap of the same user, swap with theirs
+    old_type = previous["reaction_type"] if previous else None
+    if old_type == reaction_type:
+        # same reaction again: toggle it off, unless another tap changed it meanwhile
+        removed = await db.reactions.delete_one({**mine, "reaction_type": reaction_type})
+        counters = {f"reactions.{reaction_type}": -1} if removed.deleted_count else {}
+    else:
+        counters = {f"reactions.{reaction_type}": 1}
+        if old_type:
+            counters[f"reactions.{old_type}"] = -1
+    if counters:
+        post = await db.posts.find_one_and_update(
+            {"uid": post_id}, {"$inc": counters}, projection=projection, return_document=ReturnDocument.AFTER
+        )
+    else:
+        post = await db.posts.find_one({"uid": post_id}, projection)
+    if post is None:
+        await db.reactions.delete_one(mine)
+        return errors.POST_NOT_FOUND
+    return post.get("reactions", {})
 
 
 async def add_comment(db: Database, comment: Comment) -> None | UserError:
@@ -160,7 +366,8 @@ async def add_comment(db: Database, comment: Comment) -> None | UserError:
         None on success, UserError on failure
     """
     # Insert the comment
-    await db.comments.insert_one(comment.model_dump())
+    await db.comments.insert_one(comment.model_dump(exclude={"author"}))
+    await db.posts.update_one({"uid": comment.postId}, {"$inc": {"commentCount": 1}})
     return None
 
 
@@ -179,6 +386,39 @@ async def get_comments(db: Database, post_id: str) -> None | UserError | list[Co
     return [Comment.from_dict(doc) for doc in comment_docs]
 
 
+async def get_comment(db: Database, post_id: str, comment_id: str) -> Comment | None:
+    """Get one comment of a post, through the unique `uid` index."""
+    doc = await db.comments.find_one({"uid": comment_id, "postId": post_id})
+    return Comment.from_dict(doc) if doc else None
+
+
+async def get_comments_page(db: Database, post_id: str, after: PostKey | None, limit: int) -> list[Comment]:
+    """Returns up to `limit` comments of a post (most recent first) following the `after` position."""
+    query: dict = {"postId": post_id}
+    if after:
+        creation_time, uid = after
+        query["$or"] = [{"creationTime": {"$lt": creation_time}}, {"creationTime": creation_time, "uid": {"$lt": uid}}]
+    cursor = db.comments.find(query).sort([("creationTime", -1), ("uid", -1)]).limit(limit)
+    return [Comment.from_dict(doc) for doc in await cursor.to_list(length=limit)]
+
+
+async def reconcile_comment_counts(db: Database) -> int:
+    """Backfill the `commentCount` counters from the comments collection, returns the number of fixed posts.
+
+    Like `reconcile_likes`, each fix is conditional on the counter read.
+    """
+    cursor = await db.comments.aggregate([{"$group": {"_id": "$postId", "count": {"$sum": 1}}}])
+    counts = {doc["_id"]: doc["count"] async for doc in cursor}
+    fixes = []
+    async for post in db.posts.find({}, {"_id": 0, "uid": 1, "commentCount": 1}):
+        expected = counts.get(post["uid"], 0)
+        if post.get("commentCount") != expected:
+            fixes.append(UpdateOne({"uid": post["uid"], "commentCount": post.get("commentCount")}, {"$set": {"commentCount": expected}}))
+    if fixes:
+        await db.posts.bulk_write(fixes, ordered=False)
+    return len(fixes)
+
+
 async def delete_comment(db: Database, post_id: str, comment_id: str) -> None | UserError:
     """Delete a comment or all comments for a post.
 
@@ -196,5 +436,9 @@ async def delete_comment(db: Database, post_id: str, comment_id: str) -> None |
         query["uid"] = comment_id
 
     # Delete matching comment(s)
-    await db.comments.delete_many(query)
+    result = await db.comments.delete_many(query)
+    if result.deleted_count:
+        # clamped at zero, a counter lagging behind its comments must not go negative
+        remaining = {"$subtract": [{"$ifNull": ["$commentCount", 0]}, result.deleted_count]}
+        await db.posts.update_one({"uid": post_id}, [{"$set": {"commentCount": {"$max": [0, remaining]}}}])
     return None
@@ -1,14 +1,15 @@
 from typing import Any, List
 from booklovin.models.users import User
-from booklovin.models.post import Post
+from booklovin.models.post import PostView
 from booklovin.models.profile import UserProfile, UserPublic, UserStats, ReadingPersonality
 from booklovin.models.errors import UserError
-from booklovin.services import errors
+from booklovin.services import errors, user_cache
 from booklovin.models.books import ShelfStatus
+from .projections import load_posts, post_projection
 
 DB_NAME = "booklovin_test"
 
-async def get_profile_by_name(db: Any, name: str) -> UserProfile | UserError:
+async def get_profile_by_name(db: Any, name: str, view: PostView = "full") -> UserProfile | UserError:
     """
     Fetches a user's public info and all their posts by NAME.
     """
@@ -29,7 +30,7 @@ async def get_profile_by_name(db: Any, name: str) -> UserProfile | UserError:
         books_read_count=books_read_count,
         journal_entries_count=journal_entries_count,
         posts_count=posts_count,
-        # followers_count=followers_count
+        followers_count=user_doc.get("followersCount", 0),
     )
     reading_personality = ReadingPersonality(
         favorite_genres=user_doc.get("favorite_genres") or [],
@@ -48,11 +49,11 @@ async def get_profile_by_name(db: Any, name: str) -> UserProfile | UserError:
         reading_personality=reading_personality
     )
 
-    posts = []
-    cursor = db["posts"].find({"authorId": user_id}).sort("creationTime", -1)
-    async for post_doc in cursor:
+    cursor = db["posts"].find({"authorId": user_id}, post_projection(view)).sort("creationTime", -1)
+    docs = await cursor.to_list(length=None)
+    for post_doc in docs:
         post_doc.pop("_id", None)
-        posts.append(Post.from_dict(post_doc))
+    posts = load_posts(docs, view)
 
     return UserProfile(user=user_public, posts=posts)
 
@@ -69,6 +70,7 @@ async def update_user_quote(db: Any, user_id: str, quote: str) -> User | UserErr
     updated_user_doc = await db["users"].find_one({"uid": user_id})
     if updated_user_doc:
          updated_user_doc.pop("_id", None)
+         user_cache.invalidate(updated_user_doc["email"])
          return User.model_validate(updated_user_doc)
     else:
         return errors.NOT_FOUND
@@ -83,6 +85,7 @@ async def update_user_genres(db: Any, user_id: str, genres: List[str]) -> User |
     updated_user_doc = await db["users"].find_one({"uid": user_id})
     if updated_user_doc:
          updated_user_doc.pop("_id", None)
+         user_cache.invalidate(updated_user_doc["email"])
          return User.model_validate(updated_user_doc)
     return errors.NOT_FOUND
 
@@ -96,6 +99,7 @@ async def update_user_goal(db: Any, user_id: str, year: int, count: int) -> User
     updated_user_doc = await db["users"].find_one({"uid": user_id})
     if updated_user_doc:
          updated_user_doc.pop("_id", None)
+         user_cache.invalidate(updated_user_doc["email"])
          return User.model_validate(updated_user_doc)
     return errors.NOT_FOUND
 
@@ -109,5 +113,6 @@ async def update_user_archetype(db: Any, user_id: str, archetype: str) -> User |
     updated_user_doc = await db["users"].find_one({"uid": user_id})
     if updated_user_doc:
          updated_user_doc.pop("_id", None)
+         user_cache.invalidate(updated_user_doc["email"])
          return User.model_validate(updated_user_doc)
     return errors.NOT_FOUND
\ No newline at end of file
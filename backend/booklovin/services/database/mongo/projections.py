@@ -0,0 +1,30 @@
+"""Projections of the post documents, shared by the posts, timeline and profile helpers."""
+
+from typing import Any, Iterable
+
+from booklovin.models.post import SUMMARY_LENGTH, Post, PostSummary, PostView
+
+# PostSummary fields computed by the server: the content is never sent whole
+SUMMARY_PROJECTION = {
+    "_id": 0,
+    "uid": 1,
+    "creationTime": 1,
+    "authorId": 1,
+    "title": 1,
+    "reactions": 1,
+    "likes": 1,
+    "commentCount": 1,
+    "excerpt": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, SUMMARY_LENGTH]},
+    "truncated": {"$gt": [{"$strLenCP": {"$ifNull": ["$content", ""]}}, SUMMARY_LENGTH]},
+    "imageCount": {"$size": {"$ifNull": ["$imageUrls", []]}},
+}
+
+
+def post_projection(view: PostView) -> dict | None:
+    return SUMMARY_PROJECTION if view == "summary" else None
+
+
+def load_posts(docs: Iterable[dict[str, Any]], view: PostView) -> list[Post] | list[PostSummary]:
+    if view == "summary":
+        return [PostSummary.from_dict(doc) for doc in docs]
+    return [Post.from_dict(doc) for doc in docs]
@@ -1,12 +1,28 @@
 import pymongo
 from booklovin.core.config import DB_NAME, MONGO_SERVER
 
+# cleared before the tests
+COLLECTIONS = (
+    "posts",
+    "likes",
+    "users",
+    "journals",
+    "timelines",
+    "follows",
+    "like_buckets",
+    "popular",
+    "reactions",
+    "comments",
+    "post_cleanups",
+    "revoked_tokens",
+)
+
 
 def setup(user_data):
     mymongo: pymongo.MongoClient = pymongo.MongoClient(*MONGO_SERVER)
     db = mymongo[DB_NAME]
 
-    for name in ("posts", "likes", "users", "journals"):
+    for name in COLLECTIONS:
         db[name].delete_many({})
 
     db["users"].insert_one(user_data)
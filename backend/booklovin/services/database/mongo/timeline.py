@@ -0,0 +1,95 @@
+"""Materialized home timelines for mongo, shared by the users (follow) and posts helpers.
+
+A timeline document holds the most recent post ids pushed by followed authors:
+    {"owner": uid, "posts": [{"uid", "t", "author"}], "pull": [author uid]}
+Authors above FANOUT_MAX_FOLLOWERS aren't fanned out to, their followers list them
+in `pull` and get their posts merged in when reading.
+"""
+
+from booklovin.core.settings import FANOUT_MAX_FOLLOWERS, TIMELINE_LENGTH
+from booklovin.models.post import Post, PostSummary, PostView
+from pymongo.asynchronous.database import AsyncDatabase as Database
+
+from .projections import load_posts, post_projection
+
+
+def _push(entries: list[dict]) -> dict:
+    return {"$push": {"posts": {"$each": entries, "$sort": {"t": -1}, "$slice": TIMELINE_LENGTH}}}
+
+
+async def _followers(db: Database, author_id: str) -> list[str]:
+    return [f["follower"] async for f in db.follows.find({"author": author_id}, {"_id": 0, "follower": 1})]
+
+
+async def _exists(db: Database, owner_id: str) -> bool:
+    return await db.timelines.find_one({"owner": owner_id}, {"_id": 1}) is not None
+
+
+async def fan_out(db: Database, post: Post) -> None:
+    """Push a new post to the timelines of its author and followers."""
+    entry = {"uid": post.uid, "t": post.creationTime.timestamp(), "author": post.authorId}
+    if await _exists(db, post.authorId):
+        await db.timelines.update_one({"owner": post.authorId}, _push([entry]))
+    else:
+        await build(db, post.authorId)  # the new post included
+    author = await db.users.find_one({"uid": post.authorId}, {"_id": 0, "followersCount": 1})
+    if (author or {}).get("followersCount", 0) > FANOUT_MAX_FOLLOWERS:
+        return
+    followers = await _followers(db, post.authorId)
+    if followers:
+        await db.timelines.update_many({"owner": {"$in": followers}}, _push([entry]))
+
+
+async def on_follow(db: Database, follower_id: str, author_id: str, followers_count: int) -> None:
+    if followers_count == FANOUT_MAX_FOLLOWERS + 1:
+        # the author just stopped being fanned out to: every follower switches to pulling
+        await db.timelines.update_many({"owner": {"$in": await _followers(db, author_id)}}, {"$addToSet": {"pull": author_id}})
+    if not await _exists(db, follower_id):
+        await build(db, follower_id)  # the new follow included
+    elif followers_count <= FANOUT_MAX_FOLLOWERS:
+        # backfill the recent posts of the author
+        cursor = db.posts.find({"authorId": author_id}, {"_id": 0, "uid": 1, "creationTime": 1}).sort("creationTime", -1)
+        entries = [{"uid": p["uid"], "t": p["creationTime"], "author": author_id} async for p in cursor.limit(TIMELINE_LENGTH)]
+        await db.timelines.update_one({"owner": follower_id}, _push(entries))
+    else:
+        await db.timelines.update_one({"owner": follower_id}, {"$addToSet": {"pull": author_id}})
+
+
+async def on_unfollow(db: Database, follower_id: str, author_id: str) -> None:
+    await db.timelines.update_one({"owner": follower_id}, {"$pull": {"pull": author_id, "posts": {"author": author_id}}})
+
+
+async def remove_post(db: Database, post_id: str) -> None:
+    """Drop a deleted post from the timelines listing it."""
+    await db.timelines.update_many({"posts.uid": post_id}, {"$pull": {"posts": {"uid": post_id}}})
+
+
+async def build(db: Database, owner_id: str) -> None:
+    """Materialize the timeline of a user who has none yet (posts and follows saved before timelines existed)."""
+    authors = [f["author"] async for f in db.follows.find({"follower": owner_id}, {"_id": 0, "author": 1})]
+    large = {"uid": {"$in": authors}, "followersCount": {"$gt": FANOUT_MAX_FOLLOWERS}}
+    pulled = [u["uid"] async for u in db.users.find(large, {"_id": 0, "uid": 1})]
+    pushed = [owner_id, *(author for author in authors if author not in pulled)]
+    cursor = db.posts.find({"authorId": {"$in": pushed}}, {"_id": 0, "uid": 1, "creationTime": 1, "authorId": 1})
+    cursor = cursor.sort("creationTime", -1).limit(TIMELINE_LENGTH)
+    entries = [{"uid": p["uid"], "t": p["creationTime"], "author": p["authorId"]} async for p in cursor]
+    await db.timelines.update_one({"owner": owner_id}, {**_push(entries), "$addToSet": {"pull": {"$each": pulled}}}, upsert=True)
+
+
+async def read(db: Database, owner_id: str, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary] | None:
+    """Returns the `limit` most recent posts of the timeline, None if the user has no timeline yet."""
+    timeline = await db.timelines.find_one({"owner": owner_id}, {"_id": 0, "posts": {"$slice": limit}, "pull": 1})
+    if timeline is None:
+        return None
+    uids = [entry["uid"] for entry in timeline.get("posts", [])]
+    posts = await db.posts.find({"uid": {"$in": uids}}, post_projection(view)).to_list(length=limit) if uids else []
+    if timeline.get("pull"):
+        posts += (
+            await db.posts
+            .find({"authorId": {"$in": timeline["pull"]}}, post_projection(view))
+            .sort("creationTime", -1)
+            .limit(limit)
+            .to_list()
+        )
+    unique = {p["uid"]: p for p in posts}  # a post can be both pushed and pulled
+    return load_posts(sorted(unique.values(), key=lambda p: p["creationTime"], reverse=True)[:limit], view)
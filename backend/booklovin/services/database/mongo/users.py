@@ -1,9 +1,16 @@
 """Database helper for mongo: Users"""
 
+from datetime import datetime, timezone
+
+import pymongo.errors
 from booklovin.models.errors import UserError
-from booklovin.models.users import User
+from booklovin.models.users import RevokedToken, User
+from booklovin.services import errors
+from pymongo import ReturnDocument
 from pymongo.asynchronous.database import AsyncDatabase as Database
 
+from . import timeline
+
 
 async def get(db: Database, email: str | None = None, uid: str | None = None) -> User | None:
     req = {}
@@ -20,3 +27,55 @@ async def get(db: Database, email: str | None = None, uid: str | None = None) ->
 async def create(db: Database, user: User) -> None | UserError:
     await db.users.insert_one(user.model_dump())
     return None
+
+
+async def revoke_token(db: Database, token: RevokedToken) -> None | UserError:
+    # the TTL index on expiresAt drops the entry once the token is expired anyway
+    await db.revoked_tokens.update_one({"jti": token.jti}, {"$set": token.model_dump()}, upsert=True)
+    return None
+
+
+async def get_revoked_tokens(db: Database) -> list[RevokedToken]:
+    docs = await db.revoked_tokens.find({"expiresAt": {"$gt": datetime.now(timezone.utc)}}, {"_id": 0}).to_list(length=None)
+    for doc in docs:
+        doc["expiresAt"] = doc["expiresAt"].replace(tzinfo=timezone.utc)
+    return [RevokedToken.model_validate(doc) for doc in docs]
+
+
+async def get_names(db: Database, uids: list[str]) -> dict[str, str]:
+    """Map the given user ids to their names, in one query."""
+    cursor = db.users.find({"uid": {"$in": uids}}, {"_id": 0, "uid": 1, "name": 1})
+    return {u["uid"]: u["name"] async for u in cursor}
+
+
+async def follow(db: Database, follower_id: str, author_id: str) -> None | UserError:
+    if follower_id == author_id:
+        return errors.CANNOT_FOLLOW_SELF
+    try:
+        await db.follows.insert_one({"follower": follower_id, "author": author_id, "since": datetime.now(timezone.utc)})
+    except pymongo.errors.DuplicateKeyError:
+        return None  # already following
+    author = await db.users.find_one_and_update(
+        {"uid": author_id},
+        {"$inc": {"followersCount": 1}},
+        projection={"_id": 0, "followersCount": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if author is None:
+        await db.follows.delete_one({"follower": follower_id, "author": author_id})
+        return errors.NOT_FOUND
+    await timeline.on_follow(db, follower_id, author_id, author["followersCount"])
+    return None
+
+
+async def unfollow(db: Database, follower_id: str, author_id: str) -> None | UserError:
+    result = await db.follows.delete_one({"follower": follower_id, "author": author_id})
+    if result.deleted_count == 0:
+        return errors.NOT_FOUND
+    await db.users.update_one({"uid": author_id}, {"$inc": {"followersCount": -1}})
+    await timeline.on_unfollow(db, follower_id, author_id)
+    return None
+
+
+async def get_following(db: Database, user_id: str) -> list[str]:
+    return [f["author"] async for f in db.follows.find({"follower": user_id}, {"_id": 0, "author": 1})]
@@ -1,12 +1,32 @@
 import redis.asyncio as redis
 from booklovin.core.config import DB_NAME, REDIS_SERVER
+from booklovin.core.utils import loads
 from booklovin.services.interfaces import ServiceSetup
 from fastapi import FastAPI
 
 
+def connect() -> redis.Redis:
+    return redis.from_url(f"redis://{REDIS_SERVER[0]}:{REDIS_SERVER[1]}/{DB_NAME}")
+
+
+NAMES_KEY = "users:names"  # hash of user uid -> name, users are keyed by email otherwise
+
+
+async def _index_names(db: redis.Redis) -> None:
+    """Fill the names hash from the users saved before it existed."""
+    if await db.exists(NAMES_KEY):
+        return
+    async for key in db.scan_iter(match=get_user_key("*")):
+        data = await db.get(key)
+        if data:
+            user = loads(data)
+            await db.hset(NAMES_KEY, user["uid"], user["name"])  # type: ignore
+
+
 class RedisSetup(ServiceSetup):
     async def setup(self, app: FastAPI):
-        app.state.db = redis.from_url(f"redis://{REDIS_SERVER[0]}:{REDIS_SERVER[1]}/{DB_NAME}")
+        app.state.db = connect()
+        await _index_names(app.state.db)
 
     async def teardown(self, app: FastAPI):
         await app.state.db.aclose()
@@ -1,90 +1,263 @@
 """Database helper for mock db: Users"""
 
+import time
+
 from booklovin.core import settings
+from booklovin.core.storage import delete_uploaded_images
 from booklovin.models.errors import UserError
-from booklovin.models.post import Post
+from booklovin.models.post import POST_READ_ONLY_FIELDS, LikeState, Post, PostKey, PostSummary, PostView
 from booklovin.models.users import User
 from booklovin.services import errors
 from redis.asyncio import Redis
 
 
+TIMELINE_KEY = "posts:timeline"  # sorted set of post uids, scored by creation time
+POPULAR_KEY = "popular"  # leaderboard sorted set, with `popular:<hour>` hashes of likes per post
+CLEANUP_KEY = "cleanup:images"  # list of the image URLs of deleted posts
+# home timelines: `timeline:<uid>` sorted sets of post uids, `authored:<uid>` for the pull path
+
+
+async def _fan_out(db: Redis, post: Post) -> None:
+    score = {post.uid: post.creationTime.timestamp()}
+    owners = [post.authorId]
+    if await db.scard(f"followers:{post.authorId}") <= settings.FANOUT_MAX_FOLLOWERS:  # type: ignore
+        owners += [f.decode() for f in await db.smembers(f"followers:{post.authorId}")]  # type: ignore
+    async with db.pipeline(transaction=False) as pipe:
+        pipe.zadd(f"authored:{post.authorId}", score)
+        for owner in owners:
+            pipe.zadd(f"timeline:{owner}", score)
+            pipe.zremrangebyrank(f"timeline:{owner}", 0, -settings.TIMELINE_LENGTH - 1)
+        await pipe.execute()
+
+
 async def create(db: Redis, post: Post) -> None | UserError:
     new_post = post.to_json()
     await db.set(f"posts:{post.uid}", new_post)
+    await db.zadd(TIMELINE_KEY, {post.uid: post.creationTime.timestamp()})
+    await _fan_out(db, post)
     return None
 
 
-async def delete(db: Redis, post_id: str) -> None | UserError:
-    for name in [f"likes:{post_id}", f"posts:{post_id}"]:
+async def _check_owner(db: Redis, post_id: str, author_id: str | None) -> Post | UserError:
+    data = await db.get(f"posts:{post_id}")
+    if not data:
+        return errors.POST_NOT_FOUND
+    post = Post.from_json(data)
+    if author_id is not None and post.authorId != author_id:
+        return errors.FORBIDDEN
+    return post
+
+
+async def delete(db: Redis, post_id: str, author_id: str | None = None) -> None | UserError:
+    post = await _check_owner(db, post_id, author_id)
+    if isinstance(post, UserError):
+        return post
+    if post.imageUrls:
+        await db.rpush(CLEANUP_KEY, *post.imageUrls)  # type: ignore
+    for name in [f"likes:{post_id}", f"posts:{post_id}", f"reactions:{post_id}", f"reaction_counts:{post_id}"]:
         await db.delete(name)
+    await db.zrem(TIMELINE_KEY, post_id)
+    await db.zrem(POPULAR_KEY, post_id)
+    # follower timelines keep the uid until trimmed, reading them skips the missing posts
+    await db.zrem(f"authored:{post.authorId}", post_id)
+    await db.zrem(f"timeline:{post.authorId}", post_id)
     return None
 
 
 async def get_one(db: Redis, post_id: str) -> Post | None:
-    data = await db.get(f"posts:{post_id}")
-    if data:
-        model = Post.from_json(data)
-        model.likes = await db.scard(f"likes:{post_id}")  # type: ignore
-        return model
-    return None
+    posts = await _load(db, [post_id])
+    return posts[0] if posts else None
 
 
-async def get_all(db: Redis, start: int, end: int) -> list[Post]:
-    _, keys = await db.scan(match="posts:*", cursor=start, count=end - start)
-    posts = []
-    for key in keys:
-        post_data = await db.get(key)
-        if post_data:
-            post = Post.from_json(post_data)
-            posts.append(post)
-    return posts
+# KEYS: post, user reactions hash, counters hash - ARGV: user, reaction
+# toggles the user's reaction atomically, returns the counters (nil if the post doesn't exist)
+_REACT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+if old then redis.call('HINCRBY', KEYS[3], old, -1) end
+if old == ARGV[2] then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+else
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('HINCRBY', KEYS[3], ARGV[2], 1)
+end
+return redis.call('HGETALL', KEYS[3])
+"""
 
 
-async def like(db: Redis, post_id: str, user_id: str) -> None | UserError:
-    """Like a post"""
-    post = await get_one(db, post_id)
-    if not post:
+async def react(db: Redis, post_id: str, user_id: str, reaction_type: str) -> dict[str, int] | UserError:
+    """Adds, removes (same reaction again), or changes a user's reaction to a post."""
+    keys = [f"posts:{post_id}", f"reactions:{post_id}", f"reaction_counts:{post_id}"]
+    flat = await db.eval(_REACT_SCRIPT, len(keys), *keys, user_id, reaction_type)  # type: ignore
+    if flat is None:
         return errors.POST_NOT_FOUND
-    await db.sadd(f"likes:{post_id}", user_id)  # type: ignore
-    return None
+    return {flat[i].decode(): int(flat[i + 1]) for i in range(0, len(flat), 2)}
 
 
-async def get_popular(db: Redis) -> list[Post] | UserError:
-    """get most popular posts"""
-    keys = await db.keys("posts:*")
+async def _load(db: Redis, post_ids: list[str]) -> list[Post]:
+    if not post_ids:
+        return []
+    found = [(uid, data) for uid, data in zip(post_ids, await db.mget([f"posts:{uid}" for uid in post_ids])) if data]
+    async with db.pipeline(transaction=False) as pipe:
+        for uid, _ in found:
+            pipe.scard(f"likes:{uid}")
+            pipe.hgetall(f"reaction_counts:{uid}")
+        counts = await pipe.execute()
     posts = []
-    for key in keys:
-        post_data = await db.get(key)
-        if post_data:
-            post = Post.from_json(post_data)
-            post.likes = await db.scard(f"likes:{post.uid}")  # type: ignore
-            posts.append(post)
-    posts.sort(key=lambda x: x.likes, reverse=True)
-    return posts[: settings.RECENT_POSTS_LIMIT]
+    for (_, data), likes, reactions in zip(found, counts[::2], counts[1::2]):
+        post = Post.from_json(data)
+        post.likes = likes
+        post.reactions = {k.decode(): int(v) for k, v in reactions.items()}
+        posts.append(post)
+    return posts
 
 
-async def get_recent(db: Redis, user: User) -> list[Post] | UserError:
-    """Returns a list of recent subscribed posts"""
-    keys = await db.keys("posts:*")
-    posts = []
-    for key in keys:
-        post_data = await db.get(key)
-        if post_data:
-            post = Post.from_json(post_data)
-            if post.authorId == user.uid:
-                posts.append(post)
-    posts.sort(key=lambda x: x.creationTime, reverse=True)
-    return posts[: settings.RECENT_POSTS_LIMIT]
-
-
-async def update(db: Redis, post_id: str, post_data: Post) -> None | UserError:
-    """Updates an existing post."""
-    update_data = post_data.model_dump(exclude_unset=True)  # Only update provided fields
-    post = await get_one(db, post_id)
-
-    if post:
-        post.update(update_data)
-        await db.set(f"posts:{post_id}", post.to_json())
+async def get_many(db: Redis, post_ids: list[str], view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """get posts in the order of `post_ids`, skipping the missing ones (posts are stored whole, summaries are cut here)"""
+    posts = await _load(db, post_ids)
+    return [PostSummary.from_post(p) for p in posts] if view == "summary" else posts
+
+
+async def get_all(db: Redis, start: int, end: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    _, keys = await db.scan(match="posts:*", cursor=start, count=end - start)
+    return await get_many(db, [k.decode().removeprefix("posts:") for k in keys if k.decode() != TIMELINE_KEY], view)
+
+
+async def get_page(db: Redis, after: PostKey | None, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]:
+    """Returns up to `limit` posts (most recent first) following the `after` position."""
+    if after:
+        creation_time, uid = after
+        # members sharing a score are ordered by uid, keep the ones after the cursor first
+        ties = await db.zrangebyscore(TIMELINE_KEY, creation_time, creation_time)
+        uids = sorted((t.decode() for t in ties if t.decode() < uid), reverse=True)[:limit]
+        uids += [u.decode() for u in await db.zrevrangebyscore(TIMELINE_KEY, f"({creation_time}", "-inf", start=0, num=limit - len(uids))]
     else:
+        uids = [u.decode() for u in await db.zrevrange(TIMELINE_KEY, 0, limit - 1)]
+    return await get_many(db, uids, view)
+
+
+async def like(db: Redis, post_id: str, user_id: str) -> LikeState | UserError:
+    """(toggle) like a post"""
+    key = f"likes:{post_id}"
+    if await db.srem(key, user_id):  # type: ignore
+        await _count_popular(db, post_id, -1)
+        return LikeState(liked=False, likes=await db.scard(key))  # type: ignore
+    if not await db.exists(f"posts:{post_id}"):
         return errors.POST_NOT_FOUND
+    pipe = db.pipeline()
+    pipe.sadd(key, user_id)
+    pipe.scard(key)
+    _, likes = await pipe.execute()
+    await _count_popular(db, post_id, 1)
+    return LikeState(liked=True, likes=likes)
+
+
+async def reconcile_likes(db: Redis) -> int:
+    """Likes are counted from the `likes:` sets when reading, nothing can drift"""
+    return 0
+
+
+async def reconcile_comment_counts(db: Redis) -> int:
+    """Comments aren't stored in Redis, there are no counters to repair"""
+    return 0
+
+
+def _current_hour() -> int:
+    return int(time.time() // 3600)
+
+
+async def _count_popular(db: Redis, post_id: str, delta: int) -> None:
+    """Update the hourly buckets and the popular posts leaderboard."""
+    hour = _current_hour()
+    if delta < 0:
+        # likes aren't timestamped, take it back from the most recent bucket having one
+        hours = list(range(hour, hour - settings.POPULAR_WINDOW_HOURS, -1))
+        pipe = db.pipeline()
+        for h in hours:
+            pipe.hget(f"{POPULAR_KEY}:{h}", post_id)
+        counts = await pipe.execute()
+        hour = next((h for h, count in zip(hours, counts) if int(count or 0) > 0), -1)
+        if hour < 0:
+            return
+    pipe = db.pipeline()
+    pipe.hincrby(f"{POPULAR_KEY}:{hour}", post_id, delta)
+    pipe.sadd(f"{POPULAR_KEY}:hours", hour)
+    pipe.zincrby(POPULAR_KEY, delta, post_id)
+    await pipe.execute()
+
+
+async def seed_popular(db: Redis) -> int:
+    """Rank the liked posts when there's no leaderboard yet (likes aren't timestamped: they count as of now)."""
+    if await db.exists(POPULAR_KEY, f"{POPULAR_KEY}:hours"):
+        return 0
+    hour = _current_hour()
+    seeded = 0
+    async for key in db.scan_iter(match="likes:*"):
+        post_id = key.decode().removeprefix("likes:")
+        if likes := await db.scard(key):  # type: ignore
+            # set, not incremented: workers starting together can't count a like twice
+            pipe = db.pipeline()
+            pipe.hset(f"{POPULAR_KEY}:{hour}", post_id, likes)
+            pipe.sadd(f"{POPULAR_KEY}:hours", hour)
+            pipe.zadd(POPULAR_KEY, {post_id: likes})
+            await pipe.execute()
+            seeded += 1
+    return seeded
+
+
+async def roll_popular(db: Redis) -> int:
+    """Drop the buckets out of the popular posts window."""
+    cutoff = _current_hour() - settings.POPULAR_WINDOW_HOURS
+    expired = [int(h) for h in await db.smembers(f"{POPULAR_KEY}:hours") if int(h) <= cutoff]  # type: ignore
+    for hour in expired:
+        bucket_key = f"{POPULAR_KEY}:{hour}"
+        # claim the bucket so that concurrent workers never subtract it twice
+        pipe = db.pipeline()
+        pipe.hgetall(bucket_key)
+        pipe.delete(bucket_key)
+        pipe.srem(f"{POPULAR_KEY}:hours", hour)
+        bucket, deleted, _ = await pipe.execute()
+        if deleted and bucket:
+            pipe = db.pipeline()
+            for post_id, likes in bucket.items():
+                pipe.zincrby(POPULAR_KEY, -int(likes), post_id)
+            await pipe.execute()
+    await db.zremrangebyscore(POPULAR_KEY, "-inf", 0)
+    return len(expired)
+
+
+async def cleanup_deleted(db: Redis) -> int:
+    """Remove the images of deleted posts (their keys go with the post), returns the number of files removed."""
+    removed = 0
+    while urls := await db.lpop(CLEANUP_KEY, settings.CLEANUP_BATCH_SIZE):  # type: ignore
+        removed += await delete_uploaded_images([u.decode() for u in urls])
+    return removed
+
+
+async def get_popular(db: Redis, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """get most liked posts of the window"""
+    uids = [u.decode() for u in await db.zrevrange(POPULAR_KEY, 0, settings.POPULAR_POSTS_LIMIT - 1)]
+    return await get_many(db, uids, view)
+
+
+async def get_recent(db: Redis, user: User, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError:
+    """Returns a list of recent subscribed posts"""
+    limit = settings.RECENT_POSTS_LIMIT
+    scored = await db.zrevrange(f"timeline:{user.uid}", 0, limit - 1, withscores=True)
+    for author in await db.smembers(f"following:{user.uid}"):  # type: ignore
+        author = author.decode()
+        if await db.scard(f"followers:{author}") > settings.FANOUT_MAX_FOLLOWERS:  # type: ignore
+            scored += await db.zrevrange(f"authored:{author}", 0, limit - 1, withscores=True)
+    latest = sorted(dict(scored).items(), key=lambda x: x[1], reverse=True)[:limit]
+    return await get_many(db, [uid.decode() for uid, _ in latest], view)
+
+
+async def update(db: Redis, post_id: str, post_data: Post, author_id: str | None = None) -> None | UserError:
+    """Updates an existing post, only if written by `author_id` when given."""
+    update_data = post_data.model_dump(exclude_unset=True, exclude=POST_READ_ONLY_FIELDS)  # Only update provided fields
+    post = await _check_owner(db, post_id, author_id)
+    if isinstance(post, UserError):
+        return post
+    post.update(update_data)
+    await db.set(f"posts:{post_id}", post.to_json())
     return None
@@ -1,7 +1,7 @@
 import redis
 from booklovin.core.utils import dumps
 
-from .core import DB_NAME, REDIS_SERVER, get_user_key
+from .core import DB_NAME, NAMES_KEY, REDIS_SERVER, get_user_key
 
 
 def setup(user_data):
@@ -9,4 +9,5 @@ def setup(user_data):
     client.flushdb()
     uid = user_data["email"]
     client.set(get_user_key(uid), dumps(user_data))
+    client.hset(NAMES_KEY, user_data["uid"], user_data["name"])
     client.close()
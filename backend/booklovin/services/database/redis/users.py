@@ -1,14 +1,19 @@
 """Database helper for mock db: Users"""
 
 from booklovin.models.errors import UserError
-from booklovin.models.users import User
+from booklovin.core import settings
+from booklovin.models.users import RevokedToken, User
+from booklovin.services import errors
 from redis.asyncio import Redis
 
-from .core import get_user_key
+from .core import NAMES_KEY, get_user_key
 
 
 async def create(db: Redis, user: User) -> None | UserError:
-    await db.set(get_user_key(user.email), user.to_json())
+    async with db.pipeline(transaction=False) as pipe:
+        pipe.set(get_user_key(user.email), user.to_json())
+        pipe.hset(NAMES_KEY, user.uid, user.name)
+        await pipe.execute()
     return None
 
 
@@ -20,3 +25,51 @@ async def get(db: Redis, email: str | None = None, uid: str | None = None) -> Us
     if user_data:
         return User.from_json(user_data)
     return None
+
+
+async def get_names(db: Redis, uids: list[str]) -> dict[str, str]:
+    names = await db.hmget(NAMES_KEY, uids)  # type: ignore
+    return {uid: name.decode() for uid, name in zip(uids, names) if name is not None}
+
+
+async def revoke_token(db: Redis, token: RevokedToken) -> None | UserError:
+    await db.set(f"revoked:{token.jti}", token.model_dump_json(), exat=int(token.expiresAt.timestamp()) + 1)
+    return None
+
+
+async def get_revoked_tokens(db: Redis) -> list[RevokedToken]:
+    tokens = []
+    async for key in db.scan_iter(match="revoked:*"):
+        data = await db.get(key)
+        if data:
+            tokens.append(RevokedToken.model_validate_json(data))
+    return tokens
+
+
+async def follow(db: Redis, follower_id: str, author_id: str) -> None | UserError:
+    if follower_id == author_id:
+        return errors.CANNOT_FOLLOW_SELF
+    if not await db.sadd(f"following:{follower_id}", author_id):  # type: ignore
+        return None  # already following
+    await db.sadd(f"followers:{author_id}", follower_id)  # type: ignore
+    if await db.scard(f"followers:{author_id}") <= settings.FANOUT_MAX_FOLLOWERS:
+        # backfill the recent posts of the author, larger authors are pulled when reading
+        recent = await db.zrevrange(f"authored:{author_id}", 0, settings.TIMELINE_LENGTH - 1, withscores=True)
+        if recent:
+            await db.zadd(f"timeline:{follower_id}", dict(recent))
+            await db.zremrangebyrank(f"timeline:{follower_id}", 0, -settings.TIMELINE_LENGTH - 1)
+    return None
+
+
+async def unfollow(db: Redis, follower_id: str, author_id: str) -> None | UserError:
+    if not await db.srem(f"following:{follower_id}", author_id):  # type: ignore
+        return errors.NOT_FOUND
+    await db.srem(f"followers:{author_id}", follower_id)  # type: ignore
+    authored = await db.zrange(f"authored:{author_id}", 0, -1)
+    if authored:
+        await db.zrem(f"timeline:{follower_id}", *authored)
+    return None
+
+
+async def get_following(db: Redis, user_id: str) -> list[str]:
+    return [a.decode() for a in await db.smembers(f"following:{user_id}")]  # type: ignore
@@ -3,5 +3,8 @@ from booklovin.models.errors import ErrorCode, gen_error
 ABUSIVE_USAGE = gen_error(ErrorCode.INVALID_PARAMETER, details="Abusive usage")
 FORBIDDEN = gen_error(ErrorCode.INVALID_PARAMETER, details="Forbidden")
 NOT_FOUND = gen_error(ErrorCode.NOT_FOUND)
+INVALID_CURSOR = gen_error(ErrorCode.INVALID_PARAMETER, details="Invalid cursor")
+# User specific
+CANNOT_FOLLOW_SELF = gen_error(ErrorCode.INVALID_PARAMETER, details="Cannot follow yourself")
 # Post specific
 POST_NOT_FOUND = gen_error(ErrorCode.NOT_FOUND, details="Post not found")
@@ -0,0 +1,163 @@
+"""Live events pushed to the clients of the /posts/events stream.
+
+Writes publish small events, `post` for a new post and `likes` / `reactions` with the
+new counters of a post, and every open stream of the worker receives them through its
+own bounded queue. With EVENTS_BACKEND=redis the events go through a Redis channel
+instead, so the streams of every worker see the writes of the others.
+
+A stream too slow to keep up with its queue is closed rather than slowing the
+publishers down: the client reconnects and reloads what it shows.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Protocol
+
+from booklovin.core import metrics
+from booklovin.core.config import EVENTS_BACKEND
+from booklovin.core.settings import EVENTS_QUEUE_SIZE
+from booklovin.core.utils import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "events"
+
+_stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0}
+
+
+class Hub:
+    """Fan-out of the events to the subscribers of this worker."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._queues: set[asyncio.Queue] = set()
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(event)
+                _stats["delivered"] += 1
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue) -> None:
+        # the pending events are lost anyway, make room for the end of stream marker
+        self._queues.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        _stats["dropped_subscribers"] += 1
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving the events, then None if the subscriber was dropped."""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._queues.add(queue)
+        try:
+            yield queue
+        finally:
+            self._queues.discard(queue)
+
+    def size(self) -> int:
+        return len(self._queues)
+
+
+class Broker(Protocol):
+    hub: Hub
+
+    async def publish(self, event: dict[str, Any]) -> None: ...
+
+    def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class MemoryBroker:
+    """Per worker events, enough for a single worker deployment."""
+
+    def __init__(self, hub: Hub):
+        self.hub = hub
+
+    async def publish(self, event: dict[str, Any]) -> None:
+        self.hub.dispatch(event)
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """Events shared through a Redis channel, each worker relays them to its own subscribers."""
+
+    def __init__(self, hub: Hub):
+        from booklovin.services.database.redis.core import connect
+
+        self.hub = hub
+        self.db = connect()
+        self._listener: asyncio.Task | None = None
+
+    async def publish(self, event: dict[str, Any]) -> None:
+        await self.db.publish(CHANNEL, dumps(event))
+
+    def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.db.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.hub.dispatch(loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error listening to the events channel, retrying: {e}")
+                await asyncio.sleep(1)
+
+
+def _make_broker() -> Broker:
+    hub = Hub(EVENTS_QUEUE_SIZE)
+    if EVENTS_BACKEND == "redis":
+        return RedisBroker(hub)
+    return MemoryBroker(hub)
+
+
+_broker = _make_broker()
+
+
+async def publish(type: str, **data: Any) -> None:
+    """Publish an event, never fails the write that triggered it."""
+    _stats["published"] += 1
+    try:
+        await _broker.publish({"type": type, **data})
+    except Exception as e:
+        logger.error(f"Error publishing a {type} event: {e}")
+
+
+def subscribe():
+    """Async context manager of a subscription: a queue of events, None once dropped."""
+    return _broker.hub.subscribe()
+
+
+def start() -> None:
+    _broker.start()
+
+
+async def stop() -> None:
+    await _broker.stop()
+
+
+def _metrics() -> dict[str, Any]:
+    return {**_stats, "backend": EVENTS_BACKEND, "subscribers": _broker.hub.size()}
+
+
+metrics.register("events", _metrics)
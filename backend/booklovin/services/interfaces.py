@@ -2,9 +2,9 @@ from typing import Any, Protocol, runtime_checkable, List
 
 from booklovin.models.profile import UserProfile
 from booklovin.models.errors import UserError
-from booklovin.models.post import Post
+from booklovin.models.post import LikeState, Post, PostKey, PostSummary, PostView
 from booklovin.models.comments import Comment
-from booklovin.models.users import User
+from booklovin.models.users import RevokedToken, User
 from booklovin.models.journals import JournalEntry, JournalEntryUpdate
 from booklovin.models.confessions import Confession, NewConfession
 from booklovin.models.books import ShelfItem
@@ -25,19 +25,30 @@ class JournalService(Protocol):
 @runtime_checkable
 class PostService(Protocol):
     async def create(self, db: Any, post: Post) -> None | UserError: ...
-    async def delete(self, db: Any, post_id: str) -> None | UserError: ...
-    async def update(self, db: Any, post_id: str, post_data: Post) -> None | UserError: ...
+    async def delete(self, db: Any, post_id: str, author_id: str | None = None) -> None | UserError: ...
+    async def update(self, db: Any, post_id: str, post_data: Post, author_id: str | None = None) -> None | UserError: ...
     async def exists(self, db: Any, post_id: str) -> bool: ...
     # query
     async def get_one(self, db: Any, post_id: str) -> Post | None: ...
-    async def get_all(self, db: Any, start: int, end: int) -> list[Post]: ...
-    async def get_recent(self, db: Any, user: User) -> list[Post] | UserError: ...
-    async def get_popular(self, db: Any) -> list[Post] | UserError: ...
+    async def get_many(self, db: Any, post_ids: list[str], view: PostView = "full") -> list[Post] | list[PostSummary]: ...
+    async def get_all(self, db: Any, start: int, end: int, view: PostView = "full") -> list[Post] | list[PostSummary]: ...
+    async def get_page(self, db: Any, after: PostKey | None, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]: ...
+    async def get_recent(self, db: Any, user: User, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError: ...
+    async def get_popular(self, db: Any, view: PostView = "full") -> list[Post] | list[PostSummary] | UserError: ...
+    async def search(self, db: Any, query: str, offset: int, limit: int, view: PostView = "full") -> list[Post] | list[PostSummary]: ...
+    async def seed_popular(self, db: Any) -> int: ...
+    async def roll_popular(self, db: Any) -> int: ...
+    async def cleanup_deleted(self, db: Any) -> int: ...
     # likes
-    async def like(self, db: Any, post_id: str, user_id: str) -> None | UserError: ...
+    async def like(self, db: Any, post_id: str, user_id: str) -> LikeState | UserError: ...
+    async def reconcile_likes(self, db: Any) -> int: ...
+    async def react(self, db: Any, post_id: str, user_id: str, reaction_type: str) -> dict[str, int] | UserError: ...
     # comments
     async def add_comment(self, db: Any, comment: Comment) -> None | UserError: ...
     async def get_comments(self, db: Any, post_id: str) -> None | UserError | list[Comment]: ...
+    async def get_comments_page(self, db: Any, post_id: str, after: PostKey | None, limit: int) -> list[Comment]: ...
+    async def get_comment(self, db: Any, post_id: str, comment_id: str) -> Comment | None: ...
+    async def reconcile_comment_counts(self, db: Any) -> int: ...
     async def delete_comment(self, db: Any, post_id: str, comment_id: str) -> None | UserError: ...
 
 
@@ -45,6 +56,14 @@ class PostService(Protocol):
 class UserService(Protocol):
     async def get(self, db: Any, uid: str | None = None, email: str | None = None) -> User | None: ...
     async def create(self, db: Any, user: User) -> None | UserError: ...
+    async def get_names(self, db: Any, uids: list[str]) -> dict[str, str]: ...
+    # follow graph
+    async def follow(self, db: Any, follower_id: str, author_id: str) -> None | UserError: ...
+    async def unfollow(self, db: Any, follower_id: str, author_id: str) -> None | UserError: ...
+    async def get_following(self, db: Any, user_id: str) -> list[str]: ...
+    # revoked tokens
+    async def revoke_token(self, db: Any, token: RevokedToken) -> None | UserError: ...
+    async def get_revoked_tokens(self, db: Any) -> list[RevokedToken]: ...
 
 
 @runtime_checkable
@@ -63,7 +82,7 @@ class ShelfService(Protocol):
 
 @runtime_checkable
 class ProfileService(Protocol):
-    async def get_profile_by_name(self, db: Any, name: str) -> UserProfile | UserError: ...
+    async def get_profile_by_name(self, db: Any, name: str, view: PostView = "full") -> UserProfile | UserError: ...
     async def update_user_quote(self, db: Any, user_id: str, quote: str) -> User | UserError: ...
     async def update_user_genres(self, db: Any, user_id: str, genres: List[str]) -> User | UserError: ...
     async def update_user_goal(self, db: Any, user_id: str, year: int, count: int) -> User | UserError: ...
@@ -0,0 +1,58 @@
+"""Periodic background jobs, run by every worker for the application lifetime."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from booklovin.core.settings import (
+    CLEANUP_INTERVAL,
+    COUNTERS_RECONCILE_INTERVAL,
+    POPULAR_ROLL_INTERVAL,
+    REVOCATION_REFRESH_INTERVAL,
+)
+from booklovin.services import database, revocation, versions
+
+logger = logging.getLogger(__name__)
+
+
+async def _every(interval: float, job: Callable[[Any], Awaitable[Any]], db: Any) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job(db)
+        except Exception as e:
+            logger.error(f"Error running background job {job.__module__}.{job.__name__}: {e}")
+
+
+async def _reconcile_counters(db: Any) -> None:
+    fixed = await database.post.reconcile_likes(db)
+    fixed += await database.post.reconcile_comment_counts(db)
+    if fixed:
+        await versions.bump("posts")
+
+
+async def _roll_popular(db: Any) -> None:
+    if await database.post.roll_popular(db):
+        await versions.bump("popular")
+
+
+async def catch_up(db: Any) -> None:
+    """Run once at startup, before serving: bring the denormalized data up to date."""
+    await _reconcile_counters(db)
+    if await database.post.seed_popular(db):
+        await versions.bump("popular")
+
+
+def start(db: Any) -> list[asyncio.Task]:
+    schedule = (
+        (REVOCATION_REFRESH_INTERVAL, revocation.load),
+        (COUNTERS_RECONCILE_INTERVAL, _reconcile_counters),
+        (POPULAR_ROLL_INTERVAL, _roll_popular),
+        (CLEANUP_INTERVAL, database.post.cleanup_deleted),
+    )
+    return [asyncio.create_task(_every(interval, job, db)) for interval, job in schedule]
+
+
+def stop(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
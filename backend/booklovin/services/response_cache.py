@@ -0,0 +1,196 @@
+"""Cache of the responses that are the same for every user.
+
+    @cached("books:search", ttl=3600, stale=86400, vary=("q", "limit"))
+    async def search_open_library(q: str, limit: int = 10): ...
+
+An entry is fresh for `ttl` seconds, then served stale for up to `stale` more seconds
+while a single background task recomputes it (stale-while-revalidate). Concurrent misses
+of a key wait for the same computation (single-flight), so a hot entry expiring costs one
+recompute per worker instead of one per request.
+
+Entries live in the worker memory and, with RESPONSE_CACHE_REDIS, are also shared through
+Redis as JSON: a value read from Redis comes back as plain JSON data, which the route's
+`response_model` turns into the response as usual.
+
+`invalidate` bumps the key's generation: entries and in-flight computations of an older
+generation are dropped instead of served or stored. With Redis the generation is shared,
+so the other workers drop their local entry too, at the cost of reading it on each hit;
+without Redis, they keep serving theirs until it expires.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Sequence
+
+from booklovin.core import metrics
+from booklovin.core.cache import TTLCache
+from booklovin.core.config import RESPONSE_CACHE_REDIS
+from booklovin.core.settings import RESPONSE_CACHE_SIZE
+from booklovin.core.utils import dumps, loads
+from booklovin.models.errors import UserError
+from booklovin.services import versions
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+_stats = {"fresh": 0, "stale": 0, "remote": 0, "computed": 0, "joined": 0}
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fresh_until: float  # wall clock, shared with the redis tier
+    digest: str  # of the JSON value, a recompute giving the same one keeps the ETag version
+    generation: int = 0  # of the key when the value was computed
+
+
+def _digest(data: Any) -> str:
+    return hashlib.blake2b(dumps(data).encode(), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int, shared: bool):
+        self._local: TTLCache[_Entry] = TTLCache(maxsize, ttl=float("inf"))
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._generations: dict[str, int] = {}  # only the invalidated keys
+        self._redis = None
+        if shared:
+            from booklovin.services.database.redis.core import connect
+
+            self._redis = connect()
+
+    async def get(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float, stale: float, version: str | None = None) -> Any:
+        """Return the cached value of `key`, calling `compute` if it's missing or too old.
+
+        `version` names the ETag version (see services.versions) to bump when the value changes.
+        """
+        now = time.time()
+        generation = await self._generation(key)
+        entry = self._local.get(key)
+        if entry is not None and entry.generation != generation:
+            entry = None
+        if entry is None and self._redis is not None:
+            entry = await self._remote_get(key, now, stale, generation)
+            if entry is not None:
+                _stats["remote"] += 1
+                await self._store_local(key, entry, now, stale, version)
+        if entry is not None and now < entry.fresh_until:
+            _stats["fresh"] += 1
+            return entry.value
+        if entry is not None:
+            _stats["stale"] += 1
+            if key not in self._inflight:
+                self._start(key, compute, ttl, stale, version, generation).add_done_callback(_log_failure)
+            return entry.value
+        if key in self._inflight:
+            _stats["joined"] += 1
+            task = self._inflight[key]
+        else:
+            task = self._start(key, compute, ttl, stale, version, generation)
+        # a cancelled request must not cancel the computation others are waiting for
+        return await asyncio.shield(task)
+
+    async def invalidate(self, key: str) -> None:
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._local.pop(key)
+        # requests from now on start a computation of the new generation
+        self._inflight.pop(key, None)
+        if self._redis is not None:
+            await self._redis.incr(f"response_gen:{key}")
+            await self._redis.delete(f"response:{key}")
+
+    async def _generation(self, key: str) -> int:
+        if self._redis is None:
+            return self._generations.get(key, 0)
+        return int(await self._redis.get(f"response_gen:{key}") or 0)
+
+    def _start(
+        self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float, stale: float, version: str | None, generation: int
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self._compute(key, compute, ttl, stale, version, generation))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is task else None)
+        return task
+
+    async def _compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]], ttl: float, stale: float, version: str | None, generation: int
+    ) -> Any:
+        value = await compute()
+        _stats["computed"] += 1
+        if isinstance(value, UserError):
+            return value  # errors aren't cached
+        if await self._generation(key) != generation:
+            return value  # invalidated meanwhile: the value may predate the change
+        now = time.time()
+        encoded = jsonable_encoder(value)
+        entry = _Entry(value, now + ttl, _digest(encoded), generation)
+        await self._store_local(key, entry, now, stale, version)
+        if self._redis is not None:
+            data = dumps({"value": encoded, "fresh_until": entry.fresh_until, "digest": entry.digest, "generation": generation})
+            await self._redis.set(f"response:{key}", data, ex=int(ttl + stale) + 1)
+        return value
+
+    async def _store_local(self, key: str, entry: _Entry, now: float, stale: float, version: str | None) -> None:
+        previous = self._local.get(key)
+        self._local.set(key, entry, ttl=entry.fresh_until + stale - now)
+        if version and (previous is None or previous.digest != entry.digest):
+            await versions.bump(version)
+
+    async def _remote_get(self, key: str, now: float, stale: float, generation: int) -> _Entry | None:
+        data = await self._redis.get(f"response:{key}")  # type: ignore
+        if not data:
+            return None
+        stored = loads(data)
+        entry = _Entry(
+            stored["value"], stored["fresh_until"], stored.get("digest") or _digest(stored["value"]), stored.get("generation", 0)
+        )
+        return entry if now < entry.fresh_until + stale and entry.generation == generation else None
+
+    def size(self) -> int:
+        return len(self._local)
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        logger.error(f"Error refreshing a cached response: {task.exception()}")
+
+
+_cache = ResponseCache(RESPONSE_CACHE_SIZE, shared=RESPONSE_CACHE_REDIS)
+
+
+def cached(name: str, ttl: float, stale: float = 0, vary: Sequence[str] = (), version: str | None = None):
+    """Decorator caching the result of an async function (a route, usually).
+
+    The cache key is `name` plus the values of the parameters listed in `vary`: only
+    use it where the result doesn't depend on anything else, like the calling user.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            key = ":".join([name, *(str(arguments.get(param)) for param in vary)])
+            return await _cache.get(key, lambda: func(*args, **kwargs), ttl, stale, version)
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate(name: str) -> None:
+    """Drop the entry of a cached function without `vary` parameters."""
+    await _cache.invalidate(name)
+
+
+def _metrics() -> dict[str, Any]:
+    return {**_stats, "entries": _cache.size(), "inflight": len(_cache._inflight), "redis": RESPONSE_CACHE_REDIS}
+
+
+metrics.register("response_cache", _metrics)
@@ -0,0 +1,59 @@
+"""In-memory view of the revoked access tokens.
+
+A bloom filter answers "not revoked" for almost every token without touching the
+exact set. Revocations are persisted through the users service and every worker
+reloads them periodically (see `jobs`), dropping the ones whose token has expired anyway.
+"""
+
+import time
+from datetime import datetime
+from typing import Any
+
+from booklovin.core import metrics
+from booklovin.core.bloom import BloomFilter
+from booklovin.core.settings import REVOCATION_BLOOM_BITS, REVOCATION_BLOOM_HASHES
+from booklovin.models.users import RevokedToken
+from booklovin.services import database
+
+_bloom = BloomFilter(REVOCATION_BLOOM_BITS, REVOCATION_BLOOM_HASHES)
+_revoked: dict[str, float] = {}  # jti -> token expiration timestamp
+_stats = {"checks": 0, "bloom_hits": 0, "false_positives": 0}
+
+
+def is_revoked(jti: str | None) -> bool:
+    _stats["checks"] += 1
+    if jti is None or jti not in _bloom:
+        return False
+    _stats["bloom_hits"] += 1
+    expires = _revoked.get(jti)
+    if expires is None:
+        _stats["false_positives"] += 1
+        return False
+    return expires > time.time()
+
+
+async def revoke(db: Any, jti: str, user_id: str, expires: datetime) -> None:
+    await database.users.revoke_token(db=db, token=RevokedToken(jti=jti, userId=user_id, expiresAt=expires))
+    _revoked[jti] = expires.timestamp()
+    _bloom.add(jti)
+
+
+async def load(db: Any) -> None:
+    """Rebuild the filter from the database, purging expired entries."""
+    global _bloom, _revoked
+    now = time.time()
+    revoked = {t.jti: t.expiresAt.timestamp() for t in await database.users.get_revoked_tokens(db=db)}
+    # keep local revocations a concurrent write may not have made visible yet
+    revoked.update(_revoked)
+    revoked = {jti: exp for jti, exp in revoked.items() if exp > now}
+    bloom = BloomFilter(REVOCATION_BLOOM_BITS, REVOCATION_BLOOM_HASHES)
+    for jti in revoked:
+        bloom.add(jti)
+    _bloom, _revoked = bloom, revoked
+
+
+def _metrics() -> dict[str, Any]:
+    return {**_stats, "revoked": len(_revoked)}
+
+
+metrics.register("revocation", _metrics)
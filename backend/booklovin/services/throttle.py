@@ -0,0 +1,170 @@
+"""Sliding window throttling of login attempts.
+
+Failed attempts are counted per account and per client IP, and the limits are
+checked *before* the password is, so a credential stuffing run is rejected
+without spending bcrypt time. The window is approximated with two fixed buckets:
+the previous bucket's count is weighted by how much of it still overlaps the
+sliding window.
+
+A successful login clears the failures of its account (not of its IP). Behind a
+reverse proxy every client shares the proxy's address: set LOGIN_CLIENT_IP_HEADER
+to the header the proxy fills with the client address.
+"""
+
+import time
+from typing import Any, Protocol
+
+from booklovin.core import metrics
+from booklovin.core.config import LOGIN_CLIENT_IP_HEADER, LOGIN_THROTTLE_BACKEND
+from booklovin.core.settings import (
+    LOGIN_MAX_ATTEMPTS_PER_ACCOUNT,
+    LOGIN_MAX_ATTEMPTS_PER_IP,
+    LOGIN_THROTTLE_MAX_KEYS,
+    LOGIN_THROTTLE_WINDOW,
+)
+from fastapi import HTTPException, Request, status
+
+_stats = {"allowed": 0, "failures": 0, "rejected_account": 0, "rejected_ip": 0}
+
+
+class WindowCounter(Protocol):
+    async def hit(self, key: str) -> None:
+        """Count one event for `key`."""
+        ...
+
+    async def count(self, key: str) -> float:
+        """Return the number of events for `key` in the sliding window."""
+        ...
+
+    async def reset(self, key: str) -> None:
+        """Forget the events of `key`."""
+        ...
+
+    def size(self) -> int | None: ...
+
+
+def _estimate(current: int, previous: int, now: float, window: float) -> float:
+    elapsed = (now % window) / window
+    return current + previous * (1 - elapsed)
+
+
+class MemoryWindowCounter:
+    def __init__(self, window: float, max_keys: int):
+        self.window = window
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[int, int, int]] = {}  # key -> (bucket index, current, previous)
+
+    def _get(self, key: str, index: int) -> tuple[int, int]:
+        bucket, current, previous = self._buckets.get(key, (index, 0, 0))
+        if bucket == index:
+            return current, previous
+        return 0, current if bucket == index - 1 else 0
+
+    async def hit(self, key: str) -> None:
+        index = int(time.time() // self.window)
+        current, previous = self._get(key, index)
+        if key not in self._buckets and len(self._buckets) >= self.max_keys:
+            self._purge(index)
+        self._buckets[key] = (index, current + 1, previous)
+
+    async def count(self, key: str) -> float:
+        now = time.time()
+        return _estimate(*self._get(key, int(now // self.window)), now, self.window)
+
+    async def reset(self, key: str) -> None:
+        self._buckets.pop(key, None)
+
+    def _purge(self, index: int) -> None:
+        """Drop the keys that have no count left in the window."""
+        self._buckets = {k: v for k, v in self._buckets.items() if v[0] >= index - 1}
+
+    def size(self) -> int | None:
+        return len(self._buckets)
+
+
+class RedisWindowCounter:
+    def __init__(self, window: float):
+        from booklovin.services.database.redis.core import connect
+
+        self.window = window
+        self.db = connect()
+
+    async def hit(self, key: str) -> None:
+        bucket_key = f"throttle:{key}:{int(time.time() // self.window)}"
+        pipe = self.db.pipeline()
+        pipe.incr(bucket_key)
+        pipe.expire(bucket_key, int(self.window * 2))
+        await pipe.execute()
+
+    async def count(self, key: str) -> float:
+        now = time.time()
+        index = int(now // self.window)
+        current, previous = await self.db.mget(f"throttle:{key}:{index}", f"throttle:{key}:{index - 1}")
+        return _estimate(int(current or 0), int(previous or 0), now, self.window)
+
+    async def reset(self, key: str) -> None:
+        index = int(time.time() // self.window)
+        await self.db.delete(f"throttle:{key}:{index}", f"throttle:{key}:{index - 1}")
+
+    def size(self) -> int | None:
+        return None
+
+
+def _make_counter() -> WindowCounter:
+    if LOGIN_THROTTLE_BACKEND == "redis":
+        return RedisWindowCounter(LOGIN_THROTTLE_WINDOW)
+    return MemoryWindowCounter(LOGIN_THROTTLE_WINDOW, LOGIN_THROTTLE_MAX_KEYS)
+
+
+_counter = _make_counter()
+
+
+def _too_many_attempts() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, please retry later",
+        headers={"Retry-After": str(LOGIN_THROTTLE_WINDOW)},
+    )
+
+
+def client_ip(request: Request) -> str | None:
+    """Address of the client, as reported by the reverse proxy when LOGIN_CLIENT_IP_HEADER is set."""
+    if LOGIN_CLIENT_IP_HEADER and (forwarded := request.headers.get(LOGIN_CLIENT_IP_HEADER)):
+        # the proxy appends the address it sees: the last one is the only one it vouches for
+        return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else None
+
+
+async def check_login(account: str, client_ip: str | None) -> None:
+    """Raise a 429 if the account or the client IP has too many recent failures."""
+    if client_ip and await _counter.count(f"ip:{client_ip}") >= LOGIN_MAX_ATTEMPTS_PER_IP:
+        _stats["rejected_ip"] += 1
+        raise _too_many_attempts()
+    if await _counter.count(f"account:{account.lower()}") >= LOGIN_MAX_ATTEMPTS_PER_ACCOUNT:
+        _stats["rejected_account"] += 1
+        raise _too_many_attempts()
+    _stats["allowed"] += 1
+
+
+async def record_failure(account: str, client_ip: str | None) -> None:
+    _stats["failures"] += 1
+    if client_ip:
+        await _counter.hit(f"ip:{client_ip}")
+    await _counter.hit(f"account:{account.lower()}")
+
+
+async def record_success(account: str) -> None:
+    """A user who mistyped a few times isn't kept close to the lockout once logged in."""
+    await _counter.reset(f"account:{account.lower()}")
+
+
+def _metrics() -> dict[str, Any]:
+    return {
+        **_stats,
+        "backend": LOGIN_THROTTLE_BACKEND,
+        "tracked_keys": _counter.size(),
+        "window_seconds": LOGIN_THROTTLE_WINDOW,
+    }
+
+
+metrics.register("login_throttle", _metrics)
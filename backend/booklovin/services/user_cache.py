@@ -0,0 +1,31 @@
+"""Process-local cache of the users resolved from access tokens.
+
+Entries are keyed by email (the token subject). Writes changing a user must call
+`invalidate`, the TTL bounds staleness for changes made by other workers.
+"""
+
+from booklovin.core import metrics
+from booklovin.core.cache import TTLCache
+from booklovin.core.settings import USER_CACHE_SIZE, USER_CACHE_TTL
+from booklovin.models.users import User
+
+_users: TTLCache[User] = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def get(email: str) -> User | None:
+    return _users.get(email)
+
+
+def put(user: User) -> None:
+    _users.set(user.email, user)
+
+
+def invalidate(email: str) -> None:
+    _users.pop(email)
+
+
+def clear() -> None:
+    _users.clear()
+
+
+metrics.register("user_cache", _users.stats)
@@ -0,0 +1,140 @@
+"""Version counters behind the weak ETags of the feed and post reads.
+
+Writes bump the versions of what they change: `post:<uid>` for one post, `posts` for
+anything shown in the post lists, `popular` when the leaderboard window moves and
+`following:<uid>` when a user's subscriptions change. A read hashes the versions it
+depends on into its ETag, so a matching If-None-Match is answered with a 304 before
+the DB query and the serialization.
+"""
+
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Protocol
+from uuid import uuid4
+
+from booklovin.core import metrics
+from booklovin.core.config import VERSIONS_BACKEND
+from booklovin.core.settings import VERSIONS_MAX_KEYS, VERSIONS_MEMORY_WINDOW
+from fastapi import Request, Response, status
+
+_stats = {"not_modified": 0, "modified": 0}
+
+
+class VersionStore(Protocol):
+    @property
+    def epoch(self) -> str:
+        """Changes whenever the counters may have been reset, or may miss writes."""
+        ...
+
+    async def bump(self, *keys: str) -> None: ...
+
+    async def get(self, *keys: str) -> list[int]: ...
+
+    def size(self) -> int | None: ...
+
+
+class MemoryVersionStore:
+    """Per worker versions, evicted in LRU order.
+
+    Versions are drawn from one global sequence and evicted keys read as the highest
+    evicted version: a key bumped after a client's read always reads higher than
+    what the client saw, even once evicted.
+
+    The writes handled by the other workers aren't seen here: the epoch changes every
+    `window` seconds so that their ETags expire, see VERSIONS_BACKEND.
+    """
+
+    def __init__(self, max_keys: int, window: float):
+        self._id = uuid4().hex
+        self.window = window
+        self.max_keys = max_keys
+        self._sequence = 0
+        self._floor = 0
+        self._versions: OrderedDict[str, int] = OrderedDict()
+
+    async def bump(self, *keys: str) -> None:
+        for key in keys:
+            self._sequence += 1
+            self._versions[key] = self._sequence
+            self._versions.move_to_end(key)
+        while len(self._versions) > self.max_keys:
+            _, version = self._versions.popitem(last=False)
+            self._floor = max(self._floor, version)
+
+    async def get(self, *keys: str) -> list[int]:
+        return [self._versions.get(key, self._floor) for key in keys]
+
+    @property
+    def epoch(self) -> str:
+        if not self.window:
+            return self._id
+        return f"{self._id}:{int(time.time() // self.window)}"
+
+    def size(self) -> int | None:
+        return len(self._versions)
+
+
+class RedisVersionStore:
+    def __init__(self):
+        from booklovin.services.database.redis.core import connect
+
+        self.db = connect()
+        self.epoch = ""  # redis keeps the counters, read as-is
+
+    async def bump(self, *keys: str) -> None:
+        pipe = self.db.pipeline(transaction=False)
+        for key in keys:
+            pipe.incr(f"version:{key}")
+        await pipe.execute()
+
+    async def get(self, *keys: str) -> list[int]:
+        return [int(v or 0) for v in await self.db.mget([f"version:{key}" for key in keys])]
+
+    def size(self) -> int | None:
+        return None
+
+
+def _make_store() -> VersionStore:
+    if VERSIONS_BACKEND == "redis":
+        return RedisVersionStore()
+    return MemoryVersionStore(VERSIONS_MAX_KEYS, VERSIONS_MEMORY_WINDOW)
+
+
+_store = _make_store()
+
+
+async def bump(*keys: str) -> None:
+    await _store.bump(*keys)
+
+
+async def etag(*keys: str, variant: str = "") -> str:
+    """Weak ETag of a resource depending on `keys`, `variant` tells apart the representations (query, user...)."""
+    versions = await _store.get(*keys)
+    digest = blake2b(repr((_store.epoch, keys, versions, variant)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    # weak comparison: the W/ prefix doesn't matter
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in candidates or tag.removeprefix("W/") in candidates
+
+
+async def not_modified(request: Request, response: Response, *keys: str, variant: str = "") -> Response | None:
+    """Returns a 304 response if the client has the current version, else sets the ETag of the response."""
+    tag = await etag(*keys, variant=variant)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, tag):
+        _stats["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": tag})
+    _stats["modified"] += 1
+    response.headers["ETag"] = tag
+    return None
+
+
+def _metrics() -> dict[str, Any]:
+    return {**_stats, "backend": VERSIONS_BACKEND, "tracked_keys": _store.size()}
+
+
+metrics.register("etags", _metrics)
@@ -59,6 +59,15 @@ def database_setup():
     # Optional teardown code here if needed
 
 
+async def second_user_headers(client, email: str) -> dict[str, str]:
+    """Registers (once) another user, named after `email`, and returns its Authorization headers."""
+    name = email.split("@")[0]
+    password = f"{name}_pass"
+    await client.post("/api/v1/auth/register", json={"username": name.title(), "email": email, "password": password})
+    login = await client.post("/api/v1/auth/login", data={"username": email, "password": password})
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
 def assert_error(request):
     assert request.status_code == 200
     assert request.json()["error"]
@@ -1,5 +1,6 @@
 import pytest
 from booklovin.core.config import TEST_PASSWORD, TEST_USERNAME
+from booklovin.tests.conftest import second_user_headers
 
 # --- Test Setup ---
 
@@ -91,3 +92,73 @@ async def test_register_failure_existing_user(client):
     )
     assert response.status_code == 200
     assert response.json()["error"]  # Should be marked as error
+
+
+@pytest.mark.asyncio
+async def test_token_carries_identity_claims(client):
+    """Test that access tokens embed the claims used by claims-only routes."""
+    from booklovin.utils.user_token import decode_claims
+
+    response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": TEST_USERNAME, "password": TEST_PASSWORD},
+    )
+    assert response.status_code == 200
+    claims = decode_claims(response.json()["access_token"])
+    assert claims["sub"] == TEST_USERNAME
+    assert claims["uid"]
+    assert claims["name"]
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_token(client):
+    """Test that a token can no longer be used once logged out."""
+    login_response = await client.post(
+        "/api/v1/auth/login",
+        data={"username": TEST_USERNAME, "password": TEST_PASSWORD},
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+
+    response = await client.post("/api/v1/auth/logout", headers=headers)
+    assert response.status_code == 200
+
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_throttled_after_repeated_failures(client):
+    """Test that an account gets a 429 once it has too many failed logins."""
+    from booklovin.core.settings import LOGIN_MAX_ATTEMPTS_PER_ACCOUNT
+
+    data = {"username": "stuffed@user.com", "password": "guess"}
+    for _ in range(LOGIN_MAX_ATTEMPTS_PER_ACCOUNT):
+        assert (await client.post("/api/v1/auth/login", data=data)).status_code == 401
+    response = await client.post("/api/v1/auth/login", data=data)
+    assert response.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_login_success_clears_account_failures(client):
+    """Test that failures before a successful login don't count toward the next lockout."""
+    from booklovin.core.settings import LOGIN_MAX_ATTEMPTS_PER_ACCOUNT
+
+    email = "forgetful@user.com"
+    await second_user_headers(client, email)
+    wrong = {"username": email, "password": "guess"}
+    for _ in range(2):
+        for _ in range(LOGIN_MAX_ATTEMPTS_PER_ACCOUNT - 1):
+            assert (await client.post("/api/v1/auth/login", data=wrong)).status_code == 401
+        response = await client.post("/api/v1/auth/login", data={"username": email, "password": "forgetful_pass"})
+        assert response.status_code == 200
+
+
+def test_client_ip_from_proxy_header(monkeypatch):
+    """Test that the configured proxy header is used instead of the proxy's address."""
+    from booklovin.services import throttle
+    from starlette.requests import Request
+
+    request = Request({"type": "http", "client": ("10.0.0.1", 1234), "headers": [(b"x-forwarded-for", b"6.6.6.6, 203.0.113.7")]})
+    assert throttle.client_ip(request) == "10.0.0.1"
+    monkeypatch.setattr(throttle, "LOGIN_CLIENT_IP_HEADER", "X-Forwarded-For")
+    assert throttle.client_ip(request) == "203.0.113.7"
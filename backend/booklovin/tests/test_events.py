@@ -0,0 +1,69 @@
+"""Tests for the live events fan-out."""
+
+import asyncio
+
+import pytest
+from booklovin.api.v1.auth import _create_access_token
+from booklovin.api.v1.posts import _event_stream
+from booklovin.models.users import User
+from booklovin.services import events
+from booklovin.services.events import Hub
+from booklovin.tests.conftest import assert_success
+from booklovin.utils.user_token import EVENTS_COOKIE, get_stream_principal
+from fastapi import HTTPException
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped():
+    hub = Hub(queue_size=2)
+    async with hub.subscribe() as fast, hub.subscribe() as slow:
+        hub.dispatch({"n": 1})
+        assert await fast.get() == {"n": 1}
+        hub.dispatch({"n": 2})
+        assert await fast.get() == {"n": 2}
+        hub.dispatch({"n": 3})  # the slow queue is full: dropped, the fast one still gets it
+        assert await fast.get() == {"n": 3}
+        assert slow.get_nowait() is None
+        assert hub.size() == 1
+
+
+class _Request:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_stream_filters_posts_of_unfollowed_authors():
+    stream = _event_stream(_Request(), following={"friend"}, watched={"p0"})  # type: ignore
+    assert (await stream.__anext__()).startswith("retry:")
+    received = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    await events.publish("post", uid="p1", authorId="stranger", title="Hidden")
+    await events.publish("likes", uid="elsewhere", likes=1)  # not shown by this client
+    await events.publish("likes", uid="p0", likes=3)
+    chunk = await asyncio.wait_for(received, 1)
+    assert chunk.startswith("event: likes\n") and '"likes":3' in chunk
+    await events.publish("post", uid="p2", authorId="friend", title="Shown")
+    assert '"uid":"p2"' in await asyncio.wait_for(stream.__anext__(), 1)
+    await events.publish("reactions", uid="p2", reactions={"love": 1})  # announced, so now shown
+    assert (await asyncio.wait_for(stream.__anext__(), 1)).startswith("event: reactions\n")
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_token_from_header_or_cookie():
+    """EventSource can't send headers: the streams also take the token from their cookie, never from the URL."""
+    token = _create_access_token(User(uid="reader", name="Reader", email="reader@example.com", password=""))
+    request = _Request()
+    assert (await get_stream_principal(request, token, None)).uid == "reader"  # type: ignore  # header
+    assert (await get_stream_principal(request, None, token)).uid == "reader"  # type: ignore  # cookie
+    with pytest.raises(HTTPException):
+        await get_stream_principal(request, None, None)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_events_session_cookie(aclient):
+    response = await aclient.post("/api/v1/posts/events/session")
+    assert_success(response)
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{EVENTS_COOKIE}=") and "HttpOnly" in cookie and "Path=/api/v1/posts/events;" in cookie
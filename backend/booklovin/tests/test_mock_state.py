@@ -0,0 +1,87 @@
+"""Tests for the mock backend state, which local development persists to a file."""
+
+import pytest
+from booklovin.models.comments import Comment
+from booklovin.models.post import NewPost, Post
+from booklovin.models.users import User
+from booklovin.services.database.mock import core
+from booklovin.services.database.mock import post as mock_post
+from booklovin.services.database.mock import users as mock_users
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch) -> core.State:
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "mock.db"))
+    return core.State()
+
+
+def _reload() -> core.State:
+    state = core.State()
+    state.load()
+    return state
+
+
+@pytest.mark.asyncio
+async def test_like_unlike_round_trip(state):
+    post = Post.from_new_model(NewPost(title="Liked", content="Content"), "author")
+    await mock_post.create(state, post)
+
+    assert (await mock_post.like(state, post.uid, "fan")).liked
+    loaded = _reload()
+    assert loaded.likes[post.uid] == {"fan"}
+    assert loaded.popular == {post.uid: 1}
+    assert list(loaded.like_buckets.values()) == [{post.uid: 1}]
+
+    assert not (await mock_post.like(loaded, post.uid, "fan")).liked
+    loaded = _reload()
+    assert loaded.likes[post.uid] == set()
+    assert await mock_post.get_popular(loaded) == []
+
+
+@pytest.mark.asyncio
+async def test_seed_popular_from_likes(state):
+    posts = [Post.from_new_model(NewPost(title=f"Post {i}", content="Content"), "author") for i in range(2)]
+    for post in posts:
+        await mock_post.create(state, post)
+    state.likes[posts[0].uid] = {"fan"}
+    state.likes[posts[1].uid] = {"fan", "other fan"}  # likes saved before the leaderboard existed
+
+    assert await mock_post.seed_popular(state) == 2
+    assert [p.uid for p in await mock_post.get_popular(state)] == [posts[1].uid, posts[0].uid]
+    assert await mock_post.seed_popular(state) == 0  # only once
+
+
+@pytest.mark.asyncio
+async def test_reconcile_comment_counts(state):
+    post = Post.from_new_model(NewPost(title="Commented", content="Content"), "author")
+    await mock_post.create(state, post)
+    state.comments[post.uid] = [Comment(postId=post.uid, content=f"Comment {i}", authorId="reader") for i in range(2)]
+
+    assert await mock_post.reconcile_comment_counts(state) == 1  # comments saved before the counter
+    assert _reload().posts[0].commentCount == 2
+    assert await mock_post.reconcile_comment_counts(state) == 0
+
+
+@pytest.mark.asyncio
+async def test_timelines_fan_out_and_backfill(state):
+    state.users = [User(uid=uid, name=uid, email=f"{uid}@example.com", password="") for uid in ("reader", "author", "stranger")]
+    older = Post.from_new_model(NewPost(title="Before following", content="Content"), "author")
+    await mock_post.create(state, older)
+    await mock_users.follow(state, "reader", "author")
+    newer = Post.from_new_model(NewPost(title="After following", content="Content"), "author")
+    await mock_post.create(state, newer)
+    await mock_post.create(state, Post.from_new_model(NewPost(title="Not followed", content="Content"), "stranger"))
+
+    assert state.timelines["reader"] == [newer.uid, older.uid]  # fanned out, and backfilled on follow
+    assert [p.uid for p in await mock_post.get_recent(state, state.users[0])] == [newer.uid, older.uid]
+
+    state.timelines.clear()  # follows saved before the timelines existed
+    assert [p.uid for p in await mock_post.get_recent(state, state.users[0])] == [newer.uid, older.uid]
+
+    await mock_users.unfollow(state, "reader", "author")
+    assert await mock_post.get_recent(state, state.users[0]) == []
+
+    await mock_users.follow(state, "reader", "author")
+    await mock_post.delete(state, newer.uid)
+    await mock_post.cleanup_deleted(state)
+    assert _reload().timelines["reader"] == [older.uid]
@@ -0,0 +1,25 @@
+"""Tests for the password hashing executor."""
+
+import asyncio
+import threading
+
+import pytest
+
+from booklovin.core import passwords
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_holds_its_slot_until_done():
+    release = threading.Event()
+    before = passwords._stats["inflight"]
+    task = asyncio.create_task(passwords._run(release.wait))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.sleep(0.05)
+    assert passwords._stats["inflight"] == before + 1  # the thread is still busy
+    release.set()
+    for _ in range(100):
+        if passwords._stats["inflight"] == before:
+            break
+        await asyncio.sleep(0.01)
+    assert passwords._stats["inflight"] == before
@@ -1,5 +1,9 @@
 import pytest
-from booklovin.tests.conftest import assert_error, assert_success
+from booklovin.core import config
+from booklovin.core.settings import POPULAR_WINDOW_HOURS
+from booklovin.main import booklovin as app
+from booklovin.services import database
+from booklovin.tests.conftest import assert_error, assert_success, second_user_headers, user_data
 
 
 @pytest.mark.asyncio
@@ -123,6 +127,26 @@ async def test_update_post(aclient):
     assert updated_post_data["content"] == update_payload["content"]
 
 
+@pytest.mark.asyncio
+async def test_update_delete_post_owner_only(aclient):
+    """Only the author can update or delete a post."""
+    create_response = await aclient.post("/api/v1/posts/", data={"title": "Mine", "content": "Content"})
+    created_post_data = create_response.json()
+    post_id = created_post_data["uid"]
+
+    other_headers = await second_user_headers(aclient, "other@example.com")
+
+    update_payload = {**created_post_data, "title": "Hijacked"}
+    response = await aclient.put(f"/api/v1/posts/{post_id}", json=update_payload, headers=other_headers)
+    assert_error(response)
+    response = await aclient.delete(f"/api/v1/posts/{post_id}", headers=other_headers)
+    assert_error(response)
+    assert (await aclient.get(f"/api/v1/posts/{post_id}")).json()["title"] == "Mine"
+
+    assert_success(await aclient.delete(f"/api/v1/posts/{post_id}"))
+    assert_error(await aclient.delete(f"/api/v1/posts/{post_id}"))
+
+
 @pytest.mark.asyncio
 async def test_like_post(aclient):
     """Test liking a post."""
@@ -141,6 +165,7 @@ async def test_like_post(aclient):
     # Like the post
     response = await aclient.put(f"/api/v1/posts/{post_id}/like")
     assert_success(response)  # Expecting 200/204
+    assert response.json() == {"liked": True, "likes": initial_likes + 1}
 
     # Verify the like
     get_response = await aclient.get(f"/api/v1/posts/{post_id}")
@@ -148,6 +173,44 @@ async def test_like_post(aclient):
     liked_post_data = get_response.json()
     assert liked_post_data.get("likes", 0) == initial_likes + 1
 
+    # Liking again toggles the like off
+    response = await aclient.put(f"/api/v1/posts/{post_id}/like")
+    assert response.json() == {"liked": False, "likes": initial_likes}
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(config.DB_TYPE != "mongo", reason="edits the mongo documents")
+async def test_unlike_never_goes_negative(aclient):
+    """A counter not reconciled yet (posts older than the counter) doesn't drop below 0."""
+    post_id = (await aclient.post("/api/v1/posts/", data={"title": "Old post", "content": "Content"})).json()["uid"]
+    await aclient.put(f"/api/v1/posts/{post_id}/like")
+    await app.state.db.posts.update_one({"uid": post_id}, {"$unset": {"likes": ""}})
+
+    response = await aclient.put(f"/api/v1/posts/{post_id}/like")
+    assert response.json() == {"liked": False, "likes": 0}
+    assert await database.post.reconcile_likes(app.state.db) >= 1
+    assert (await aclient.get(f"/api/v1/posts/{post_id}")).json()["likes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_react_to_post(aclient):
+    """Reacting returns the counters, switching moves them and the same reaction removes it."""
+    create_response = await aclient.post("/api/v1/posts/", data={"title": "Post to react to", "content": "Content"})
+    post_id = create_response.json()["uid"]
+
+    response = await aclient.put(f"/api/v1/posts/{post_id}/react", json={"reaction": "heart"})
+    assert_success(response)
+    assert response.json() == {"heart": 1}
+
+    response = await aclient.put(f"/api/v1/posts/{post_id}/react", json={"reaction": "laugh"})
+    assert response.json() == {"heart": 0, "laugh": 1}
+
+    response = await aclient.put(f"/api/v1/posts/{post_id}/react", json={"reaction": "laugh"})
+    assert response.json() == {"heart": 0, "laugh": 0}
+
+    response = await aclient.put("/api/v1/posts/missing/react", json={"reaction": "heart"})
+    assert_error(response)
+
 
 @pytest.mark.asyncio
 async def test_read_popular_posts(aclient):
@@ -161,3 +224,175 @@ async def test_read_popular_posts(aclient):
     # Further assertions would depend on the definition of "popular"
     if len(data) > 0:
         assert "title" in data[0]
+
+
+@pytest.mark.asyncio
+async def test_read_posts_page(aclient):
+    """Test walking the timeline with cursors."""
+    for n in range(3):
+        assert_success(await aclient.post("/api/v1/posts/", data={"title": f"Paged {n}", "content": "Content"}))
+
+    response = await aclient.get("/api/v1/posts/page?limit=2")
+    assert_success(response)
+    first_page = response.json()
+    assert len(first_page["posts"]) == 2
+    assert first_page["next"]
+
+    response = await aclient.get(f"/api/v1/posts/page?limit=2&cursor={first_page['next']}")
+    assert_success(response)
+    second_page = response.json()
+    first_ids = {post["uid"] for post in first_page["posts"]}
+    assert not first_ids & {post["uid"] for post in second_page["posts"]}
+
+    assert_error(await aclient.get("/api/v1/posts/page?cursor=garbage"))
+
+
+@pytest.mark.asyncio
+async def test_follow_home_timeline(aclient):
+    """Posts of followed authors show up in the home timeline."""
+    author_headers = await second_user_headers(aclient, "author@example.com")
+    author_id = (await aclient.get("/api/v1/auth/me", headers=author_headers)).json()["uid"]
+
+    response = await aclient.put(f"/api/v1/profile/me/following/{author_id}")
+    assert_success(response)
+    response = await aclient.get("/api/v1/profile/me/following")
+    assert author_id in response.json()
+
+    post = await aclient.post("/api/v1/posts/", data={"title": "Followed", "content": "Content"}, headers=author_headers)
+    response = await aclient.get("/api/v1/posts/recent")
+    assert_success(response)
+    assert post.json()["uid"] in [p["uid"] for p in response.json()]
+
+    response = await aclient.delete(f"/api/v1/profile/me/following/{author_id}")
+    assert_success(response)
+    response = await aclient.get("/api/v1/posts/recent")
+    assert post.json()["uid"] not in [p["uid"] for p in response.json()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(config.DB_TYPE != "mongo", reason="drops the mongo timeline")
+async def test_first_follow_keeps_older_posts(aclient):
+    """A user whose posts predate the timelines still sees them after a first follow."""
+    author_headers = await second_user_headers(aclient, "author@example.com")
+    author_id = (await aclient.get("/api/v1/auth/me", headers=author_headers)).json()["uid"]
+    own = (await aclient.post("/api/v1/posts/", data={"title": "Before timelines", "content": "Content"})).json()["uid"]
+    await app.state.db.timelines.delete_many({"owner": user_data["uid"]})  # as saved before the timelines existed
+    await aclient.delete(f"/api/v1/profile/me/following/{author_id}")
+
+    assert_success(await aclient.put(f"/api/v1/profile/me/following/{author_id}"))
+    response = await aclient.get("/api/v1/posts/recent")
+    assert own in [p["uid"] for p in response.json()]
+
+
+@pytest.mark.asyncio
+async def test_deleted_post_cleanup(aclient):
+    """Deleting a post queues the cleanup of its likes and comments, done by the background job."""
+    post_id = (await aclient.post("/api/v1/posts/", data={"title": "Short lived", "content": "Content"})).json()["uid"]
+    await aclient.put(f"/api/v1/posts/{post_id}/like")
+    await aclient.post(f"/api/v1/posts/{post_id}/comments", json={"postId": post_id, "content": "bye"})
+    assert_success(await aclient.delete(f"/api/v1/posts/{post_id}"))
+
+    assert await database.post.cleanup_deleted(app.state.db) >= 1
+    assert await database.post.get_comments_page(app.state.db, post_id, None, 10) == []
+    assert await database.post.cleanup_deleted(app.state.db) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(config.DB_TYPE != "mongo", reason="reads the mongo collections")
+async def test_deleted_post_leaves_timelines(aclient):
+    """The cleanup drops a deleted post from the timelines, a refused delete queues nothing."""
+    db = app.state.db
+    post_id = (await aclient.post("/api/v1/posts/", data={"title": "Short lived", "content": "Content"})).json()["uid"]
+    assert_error(await aclient.delete("/api/v1/posts/nonexistent"))
+    assert await db.post_cleanups.count_documents({"post_id": "nonexistent"}) == 0
+
+    assert_success(await aclient.delete(f"/api/v1/posts/{post_id}"))
+    await database.post.cleanup_deleted(db)
+    assert await db.timelines.count_documents({"posts.uid": post_id}) == 0
+    assert await db.post_cleanups.count_documents({"post_id": post_id}) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(config.DB_TYPE != "mongo", reason="writes the mongo collections")
+async def test_cleanup_finds_orphans(aclient, monkeypatch):
+    """What a delete interrupted before queuing its cleanup left behind is found by the scan."""
+    await app.state.db.likes.insert_one({"post_id": "vanished", "user_id": "fan"})
+    monkeypatch.setattr(database.post, "_next_orphans_scan", 0.0)
+    assert await database.post.cleanup_deleted(app.state.db) >= 1
+    assert await app.state.db.likes.count_documents({"post_id": "vanished"}) == 0
+
+
+@pytest.mark.asyncio
+async def test_post_etag(aclient):
+    """Unchanged posts are answered with a 304, any change gives a new ETag."""
+    post_id = (await aclient.post("/api/v1/posts/", data={"title": "Tagged", "content": "Content"})).json()["uid"]
+    response = await aclient.get(f"/api/v1/posts/{post_id}")
+    etag = response.headers["ETag"]
+
+    response = await aclient.get(f"/api/v1/posts/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await aclient.put(f"/api/v1/posts/{post_id}/like")
+    response = await aclient.get(f"/api/v1/posts/{post_id}", headers={"If-None-Match": etag})
+    assert_success(response)
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_posts_summary_view(aclient):
+    """`view=summary` lists posts with an excerpt instead of the content."""
+    content = "word " * 100
+    await aclient.post("/api/v1/posts/", data={"title": "Long read", "content": content})
+    response = await aclient.get("/api/v1/posts/page", params={"limit": 1, "view": "summary"})
+    assert_success(response)
+    summary = response.json()["posts"][0]
+    assert summary["title"] == "Long read"
+    assert "content" not in summary
+    assert content.startswith(summary["excerpt"]) and len(summary["excerpt"]) < len(content)
+    assert summary["truncated"] is True
+    assert summary["imageCount"] == 0
+
+
+@pytest.mark.asyncio
+async def test_search_posts(aclient):
+    """Search ranks title matches first and pages through the results."""
+    await aclient.post("/api/v1/posts/", data={"title": "Thoughts", "content": "Rereading Middlemarch this winter"})
+    await aclient.post("/api/v1/posts/", data={"title": "Middlemarch", "content": "Finally finished it"})
+    response = await aclient.get("/api/v1/posts/search", params={"q": "middlemarch", "limit": 1})
+    assert_success(response)
+    page = response.json()
+    assert [p["title"] for p in page["posts"]] == ["Middlemarch"]
+
+    response = await aclient.get("/api/v1/posts/search", params={"q": "middlemarch", "limit": 1, "cursor": page["next"]})
+    assert [p["title"] for p in response.json()["posts"]] == ["Thoughts"]
+
+    response = await aclient.get("/api/v1/posts/search", params={"q": "nonexistentword"})
+    assert response.json()["posts"] == []
+
+
+@pytest.mark.asyncio
+async def test_popular_ranking_and_roll(aclient, monkeypatch):
+    """Popular posts are ranked by their likes in the window, rolled out once it has passed."""
+    ids = [(await aclient.post("/api/v1/posts/", data={"title": f"Contender {i}", "content": "Content"})).json()["uid"] for i in range(2)]
+    fan_headers = await second_user_headers(aclient, "fan@example.com")
+    await aclient.put(f"/api/v1/posts/{ids[0]}/like")
+    await aclient.put(f"/api/v1/posts/{ids[1]}/like")
+    await aclient.put(f"/api/v1/posts/{ids[1]}/like", headers=fan_headers)
+
+    popular = await database.post.get_popular(app.state.db)
+    assert [p.uid for p in popular if p.uid in ids] == [ids[1], ids[0]]
+
+    hour = database.post._current_hour()
+    monkeypatch.setattr(database.post, "_current_hour", lambda: hour + POPULAR_WINDOW_HOURS + 1)
+    assert await database.post.roll_popular(app.state.db) >= 1
+    assert not {p.uid for p in await database.post.get_popular(app.state.db)} & set(ids)
+
+
+@pytest.mark.asyncio
+async def test_get_many_keeps_order(aclient):
+    """Posts come back in the order of the ids, unknown ids are skipped."""
+    ids = [(await aclient.post("/api/v1/posts/", data={"title": f"Batch {i}", "content": "Content"})).json()["uid"] for i in range(3)]
+    wanted = [ids[2], "no-such-post", ids[0], ids[1]]
+    posts = await database.post.get_many(app.state.db, wanted)
+    assert [p.uid for p in posts] == [ids[2], ids[0], ids[1]]
+    assert [p.title for p in posts] == ["Batch 2", "Batch 0", "Batch 1"]
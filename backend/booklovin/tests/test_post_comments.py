@@ -1,6 +1,44 @@
+from types import SimpleNamespace
+
+import pymongo
 import pytest
 import pytest_asyncio
-from booklovin.tests.conftest import assert_success, assert_error
+from booklovin.api.v1 import posts
+from booklovin.core import config
+from booklovin.main import booklovin as app
+from booklovin.models.comments import Comment
+from booklovin.models.errors import UserError
+from booklovin.models.post import NewPost, Post
+from booklovin.models.users import Principal
+from booklovin.services import database, errors
+from booklovin.services.database.mock import core as mock_core
+from booklovin.services.database.mock import post as mock_post
+from booklovin.tests.conftest import assert_error, assert_success
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Records the name of every command sent to mongo."""
+
+    def __init__(self):
+        self.commands: list[str] = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event): ...
+
+    def failed(self, event): ...
+
+
+@pytest_asyncio.fixture
+async def mongo_commands(aclient, monkeypatch):
+    """Counts the commands of the app requests, sent through a dedicated client for the test."""
+    counter = CommandCounter()
+    mongo_client = pymongo.AsyncMongoClient(*config.MONGO_SERVER, event_listeners=[counter])
+    monkeypatch.setattr(app.state, "db", mongo_client[config.DB_NAME])
+    yield counter
+    await mongo_client.close()
 
 
 @pytest_asyncio.fixture
@@ -79,3 +117,71 @@ async def test_delete_one_comments_for_post(aclient, newpost):
     comments = get_response.json()
     assert isinstance(comments, list)
     assert len(comments) == 0
+
+
+@pytest.mark.asyncio
+async def test_comments_page_and_count(aclient, newpost):
+    """Comments are paginated and counted on the post."""
+    for i in range(3):
+        await aclient.post(f"/api/v1/posts/{newpost}/comments", json={"postId": newpost, "content": f"comment {i}"})
+
+    response = await aclient.get(f"/api/v1/posts/{newpost}/comments/page?limit=2")
+    assert_success(response)
+    page = response.json()
+    assert [c["content"] for c in page["comments"]] == ["comment 2", "comment 1"]
+    response = await aclient.get(f"/api/v1/posts/{newpost}/comments/page?limit=2&cursor={page['next']}")
+    page = response.json()
+    assert [c["content"] for c in page["comments"]] == ["comment 0"]
+    assert page["next"] is None
+
+    response = await aclient.get(f"/api/v1/posts/{newpost}")
+    assert response.json()["commentCount"] == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(config.DB_TYPE != "mongo", reason="counts mongo commands")
+async def test_delete_own_comment_db_operations(aclient, newpost, mongo_commands):
+    """Deleting one's own comment is one indexed lookup, the delete and the counter update."""
+    ret = await aclient.post(f"/api/v1/posts/{newpost}/comments", json={"postId": newpost, "content": "short lived"})
+    comment_id = ret.json()["uid"]
+
+    mongo_commands.commands.clear()
+    response = await aclient.delete(f"/api/v1/posts/{newpost}/comments/{comment_id}")
+    assert_success(response)
+    assert mongo_commands.commands == ["find", "delete", "update"]
+
+
+@pytest.mark.asyncio
+async def test_comments_carry_author(aclient, newpost):
+    """Listed comments and posts ship with the name of their author."""
+    await aclient.post(f"/api/v1/posts/{newpost}/comments", json={"postId": newpost, "content": "signed"})
+    response = await aclient.get(f"/api/v1/posts/{newpost}/comments")
+    assert_success(response)
+    assert all(c["author"]["penName"] == "Alice" for c in response.json())
+    response = await aclient.get(f"/api/v1/posts/{newpost}")
+    assert response.json()["author"] == {"uid": "alice-unique-id", "penName": "Alice"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("caller, allowed", [("commenter", True), ("author", True), ("stranger", False)])
+async def test_delete_comment_authorization(tmp_path, monkeypatch, caller, allowed):
+    """On the mock backend: the comment author and the post author may delete a comment, no one else."""
+    monkeypatch.setattr(mock_core, "DB_FILE", str(tmp_path / "mock.db"))
+    monkeypatch.setattr(database, "post", mock_post)
+    db = mock_core.State()
+    post = Post.from_new_model(NewPost(title="Post", content="Content"), "author")
+    await mock_post.create(db, post)
+    comment = Comment(postId=post.uid, content="Comment", authorId="commenter")
+    await mock_post.add_comment(db, comment)
+
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db)))
+    principal = Principal(uid=caller, email=f"{caller}@example.com", name=caller)
+    result = await posts.delete_a_comments_for_post(request, post.uid, comment.uid, principal)
+
+    if allowed:
+        assert not isinstance(result, UserError)
+        assert await mock_post.get_comment(db, post.uid, comment.uid) is None
+        assert (await mock_post.get_one(db, post.uid)).commentCount == 0
+    else:
+        assert result == errors.FORBIDDEN
+        assert await mock_post.get_comment(db, post.uid, comment.uid) == comment
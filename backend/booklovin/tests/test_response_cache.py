@@ -0,0 +1,64 @@
+"""Tests for the shared responses cache."""
+
+import asyncio
+
+import pytest
+from booklovin.services import response_cache, versions
+from booklovin.services.response_cache import cached
+
+
+@pytest.mark.asyncio
+async def test_single_flight_and_stale_while_revalidate():
+    calls = []
+
+    @cached("test:swr", ttl=0.2, stale=5, vary=("key",))
+    async def compute(key: str) -> list:
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return [key, len(calls)]
+
+    results = await asyncio.gather(*[compute("a") for _ in range(10)])
+    assert results == [["a", 1]] * 10  # one computation for the concurrent misses
+    assert await compute("b") == ["b", 2]
+
+    await asyncio.sleep(0.25)
+    assert await compute("a") == ["a", 1]  # stale value, refreshed in the background
+    await asyncio.sleep(0.1)
+    assert await compute("a") == ["a", 3]
+
+
+@pytest.mark.asyncio
+async def test_version_bumped_only_on_change():
+    values = iter([["same"], ["same"], ["changed"]])
+
+    @cached("test:version", ttl=0, stale=60, version="test:version")
+    async def compute() -> list:
+        return next(values)
+
+    await compute()
+    etag = await versions.etag("test:version")
+    await compute()  # stale at once: recomputed in the background, to the same value
+    await asyncio.sleep(0.01)
+    assert await versions.etag("test:version") == etag
+    await compute()
+    await asyncio.sleep(0.01)
+    assert await versions.etag("test:version") != etag
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_inflight_result():
+    values = iter([["before"], ["after"]])
+    started = asyncio.Event()
+
+    @cached("test:invalidate", ttl=60)
+    async def compute() -> list:
+        value = next(values)
+        started.set()
+        await asyncio.sleep(0.05)
+        return value
+
+    slow = asyncio.create_task(compute())
+    await started.wait()
+    await response_cache.invalidate("test:invalidate")  # while "before" is being computed
+    assert await slow == ["before"]
+    assert await compute() == ["after"]  # the older generation's result wasn't stored
@@ -0,0 +1,61 @@
+"""Tests for the uploaded images storage."""
+
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from booklovin.core import storage
+
+
+def _upload(name: str, data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name, headers=Headers({"content-type": "image/png"}))
+
+
+@pytest.mark.asyncio
+async def test_uploads_streamed_and_size_enforced(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "MAX_FILE_SIZE", 100)
+    monkeypatch.setattr(storage, "UPLOAD_CHUNK_SIZE", 16)
+
+    [url] = await storage.save_uploaded_images([_upload("ok.png", b"x" * 100)])
+    assert (tmp_path / url.removeprefix(storage.UPLOAD_URL)).read_bytes() == b"x" * 100
+
+    with pytest.raises(HTTPException) as error:
+        await storage.save_uploaded_images([_upload("big.png", b"x" * 101)])
+    assert error.value.status_code == 413
+    assert len(list(tmp_path.iterdir())) == 1  # no partial file left behind
+
+
+@pytest.mark.asyncio
+async def test_uploads_keep_order_and_report_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(storage, "UPLOAD_CONCURRENCY", 2)
+
+    urls = await storage.save_uploaded_images([_upload(f"{i}.png", bytes([i]) * (10 - i)) for i in range(5)])
+    assert [(tmp_path / url.removeprefix(storage.UPLOAD_URL)).read_bytes() for url in urls] == [bytes([i]) * (10 - i) for i in range(5)]
+
+    with pytest.raises(HTTPException) as error:
+        await storage.save_uploaded_images([_upload("fine.png", b"x"), _upload("notes.txt", b"x")])
+    assert error.value.status_code == 400
+    assert [e["filename"] for e in error.value.detail] == ["notes.txt"]
+    assert len(list(tmp_path.iterdir())) == 5  # the accepted file of a rejected batch isn't kept
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_cleans_up_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    extension = storage._extension
+
+    def broken(file):
+        if file.filename == "broken.png":
+            raise RuntimeError("boom")
+        return extension(file)
+
+    monkeypatch.setattr(storage, "_extension", broken)
+    with pytest.raises(HTTPException) as error:
+        await storage.save_uploaded_images([_upload("fine.png", b"x"), _upload("broken.png", b"x")])
+    assert error.value.status_code == 500
+    assert [e["filename"] for e in error.value.detail] == ["broken.png"]
+    assert list(tmp_path.iterdir()) == []  # the file saved meanwhile is removed
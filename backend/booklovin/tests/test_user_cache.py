@@ -0,0 +1,36 @@
+"""Tests for the user cache in front of the token lookup."""
+
+import pytest
+from freezegun import freeze_time
+
+from booklovin.core import metrics
+from booklovin.core.cache import TTLCache
+from booklovin.tests.conftest import assert_error, assert_success
+
+
+def test_ttl_cache_expiry_and_lru():
+    with freeze_time("2024-01-01 12:00:00") as frozen:
+        cache: TTLCache[int] = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)  # evicts "b", the least recently used
+        assert cache.get("b") is None
+        assert cache.evictions == 1
+        frozen.tick(11)
+        assert cache.get("a") is None
+        assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_cache_hits(aclient):
+    assert_success(await aclient.get("/api/v1/auth/me"))  # the cache is cleared on startup: warm it
+    before = metrics.snapshot()["user_cache"]["hits"]
+    for _ in range(3):
+        assert_success(await aclient.get("/api/v1/auth/me"))
+    assert metrics.snapshot()["user_cache"]["hits"] - before >= 3
+
+
+@pytest.mark.asyncio
+async def test_metrics_restricted(aclient):
+    assert_error(await aclient.get("/api/v1/metrics/"))  # the test user isn't an editor
@@ -0,0 +1,30 @@
+"""Tests for the ETag version counters."""
+
+import pytest
+from booklovin.services import versions
+from booklovin.services.versions import MemoryVersionStore
+
+
+@pytest.mark.asyncio
+async def test_memory_etags_expire_with_the_window(monkeypatch):
+    """Writes handled by other workers aren't seen: a memory ETag only holds for its window."""
+    store = MemoryVersionStore(max_keys=10, window=30)
+    monkeypatch.setattr(versions, "_store", store)
+    monkeypatch.setattr(versions.time, "time", lambda: 1000.0)
+    tag = await versions.etag("posts")
+    assert await versions.etag("posts") == tag
+    await store.bump("posts")
+    assert await versions.etag("posts") != tag
+
+    tag = await versions.etag("posts")
+    monkeypatch.setattr(versions.time, "time", lambda: 1030.0)
+    assert await versions.etag("posts") != tag
+
+
+@pytest.mark.asyncio
+async def test_memory_etags_without_window(monkeypatch):
+    store = MemoryVersionStore(max_keys=10, window=0)
+    monkeypatch.setattr(versions, "_store", store)
+    tag = await versions.etag("posts")
+    monkeypatch.setattr(versions.time, "time", lambda: 10.0**10)
+    assert await versions.etag("posts") == tag
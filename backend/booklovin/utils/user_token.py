@@ -1,13 +1,18 @@
 """Utility functions to handle user tokens."""
 
-from typing import cast
+import hashlib
+import time
+from typing import Any, cast
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Cookie, Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 
-from booklovin.core.config import oauth2_scheme
-from booklovin.core.settings import ALGORITHM, SECRET_KEY
-from booklovin.models.users import User
+from booklovin.core import metrics
+from booklovin.core.cache import TTLCache
+from booklovin.core.config import oauth2_scheme, optional_oauth2_scheme
+from booklovin.core.settings import ALGORITHM, SECRET_KEY, TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from booklovin.models.users import Principal, User, UserRole
+from booklovin.services import revocation, user_cache
 from booklovin.services.database import users
 
 CredentialsException = HTTPException(
@@ -16,24 +21,89 @@ CredentialsException = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+# cookie carrying the token of the event streams, see /posts/events/session
+EVENTS_COOKIE = "events_token"
 
-def decode_token(token: str) -> str | None:
-    """Decode a JWT token to extract the user ID."""
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    return cast(str, payload.get("sub"))
+# token digest -> verified claims
+_verified_tokens: TTLCache[dict[str, Any]] = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+metrics.register("token_cache", _verified_tokens.stats)
 
 
-# Dependency to get the current user from the token
-async def get_from_token(request: Request, token: str = Depends(oauth2_scheme)) -> User | None:
-    """Dependency function to get the currently logged user."""
+def decode_claims(token: str) -> dict[str, Any]:
+    """Decode a JWT token and return its verified claims.
+
+    Clients send the same token on every request, so the verified claims are
+    cached by token digest until the token expires.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    claims = _verified_tokens.get(key)
+    if claims is None:
+        claims = cast(dict[str, Any], jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+        ttl = claims["exp"] - time.time() if "exp" in claims else None
+        _verified_tokens.set(key, claims, ttl=ttl)
+    return claims
+
+
+def verify_token(token: str) -> dict[str, Any]:
+    """Return the claims of a valid, non revoked token or raise `CredentialsException`."""
     try:
-        user_id = decode_token(token)
-        if user_id is None:
-            raise CredentialsException
+        claims = decode_claims(token)
     except JWTError as exc:
         raise CredentialsException from exc
-    else:
-        user = await users.get(db=request.app.state.db, email=user_id)
+    if claims.get("sub") is None or revocation.is_revoked(claims.get("jti")):
+        raise CredentialsException
+    return claims
+
+
+async def _load_user(request: Request, email: str) -> User:
+    user = user_cache.get(email)
+    if user is None:
+        user = await users.get(db=request.app.state.db, email=email)
         if user is None:
             raise CredentialsException
-        return user
+        user_cache.put(user)
+    return user
+
+
+# Dependency to get the current user from the token
+async def get_from_token(request: Request, token: str = Depends(oauth2_scheme)) -> User | None:
+    """Dependency function to get the currently logged user."""
+    return await _load_user(request, verify_token(token)["sub"])
+
+
+async def get_claims(token: str = Depends(oauth2_scheme)) -> dict[str, Any]:
+    """Dependency returning the verified claims of the request token."""
+    return verify_token(token)
+
+
+async def get_principal(request: Request, token: str = Depends(oauth2_scheme)) -> Principal:
+    """Dependency returning the identity carried by the token, without a user lookup.
+
+    Use `get_from_token` instead when the route needs the current user state.
+    Tokens issued before the claims were added fall back to the user lookup.
+    """
+    return await _principal(request, token)
+
+
+async def get_stream_principal(
+    request: Request,
+    token: str | None = Depends(optional_oauth2_scheme),
+    events_token: str | None = Cookie(None, alias=EVENTS_COOKIE),
+) -> Principal:
+    """`get_principal` also taking the token from the EVENTS_COOKIE cookie.
+
+    For the event streams: the browsers' EventSource can't send an Authorization header.
+    The token isn't accepted in the URL, where access logs and proxies would record it.
+    """
+    token = token or events_token
+    if not token:
+        raise CredentialsException
+    return await _principal(request, token)
+
+
+async def _principal(request: Request, token: str) -> Principal:
+    claims = verify_token(token)
+    email = claims["sub"]
+    if "uid" not in claims:
+        return Principal.from_user(await _load_user(request, email))
+    return Principal(uid=claims["uid"], email=email, name=claims.get("name", ""), role=claims.get("role", UserRole.STANDARD))